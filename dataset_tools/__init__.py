@@ -0,0 +1,3 @@
+# GUI-free processing core of the dataset tools. Submodules are imported on
+# demand (e.g. `from dataset_tools.split import split_dataset`) so importing the
+# package stays cheap; cli.py holds the command-line entry points.
@@ -0,0 +1,343 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .incremental import IncrementalManifest, discard_manifest
+from .labels import boxes_to_pixels, list_label_files, load_labels, report_label_errors
+from .metrics import metrics
+from .shards import is_shard_path, open_shards
+
+# Decode flags of the review mode by downscale factor. JPEG decoders skip the
+# discarded resolution (fewer DCT coefficients), so a 1/4 decode is several times faster.
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+def fit_frame(frame, frame_size, fit_mode="letterbox"):
+    # Make a frame match the video size so VideoWriter never gets a mismatched frame
+    width, height = frame_size
+    frame_height, frame_width = frame.shape[:2]
+    if (frame_width, frame_height) == (width, height):
+        return frame
+    if fit_mode == "resize":
+        return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+    # Letterbox: scale to fit while keeping the aspect ratio, pad the rest with black
+    scale = min(width / frame_width, height / frame_height)
+    new_width = max(1, int(round(frame_width * scale)))
+    new_height = max(1, int(round(frame_height * scale)))
+    resized = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_AREA)
+    top = (height - new_height) // 2
+    left = (width - new_width) // 2
+    return cv2.copyMakeBorder(resized, top, height - new_height - top, left, width - new_width - left,
+                              cv2.BORDER_CONSTANT, value=(0, 0, 0))
+
+def annotate_image(image_path, boxes, output_path=None):
+    # Decode, draw and (optionally) encode one image. Runs inside the worker pool;
+    # the OpenCV calls release the GIL so threads scale across cores.
+    # image_path may also be the encoded image itself (e.g. read from a shard).
+    with metrics.timer('annotate.decode'):
+        if isinstance(image_path, str):
+            image = cv2.imread(image_path)
+        else:
+            image = cv2.imdecode(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        metrics.count('annotate.unreadable')
+        return None
+    height, width, _ = image.shape
+
+    # YOLO format: class_id center_x center_y width height (all normalized),
+    # converted to absolute pixel corners for all boxes at once
+    with metrics.timer('annotate.draw'):
+        corners = boxes_to_pixels(boxes, width, height).tolist()
+        for class_id, (x1, y1, x2, y2) in zip(boxes[:, 0].astype(int).tolist(), corners):
+            # Draw bounding box and label text on the image
+            cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(image, f'Class {class_id}', (x1, y1 - 10), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    # Save annotated image if user selected "Images" or "Both"
+    if output_path is not None:
+        with metrics.timer('annotate.write_image'):
+            cv2.imwrite(output_path, image)
+    metrics.count('annotate.images')
+    return image
+
+def draw_annotations(image_folder, annotation_folder, output_folder, result_option,
+                     fps=10, fit_mode="letterbox", workers=1, max_pending=None, label_cache=None,
+                     incremental=False, hash_contents=False):
+    # With incremental, only new or changed image/label pairs are drawn again and the
+    # annotated copies of deleted images are removed. The video holds every frame, so
+    # it is rebuilt from all images whenever anything changed.
+    # image_folder may also be a packed dataset or a split of one (see shards.py);
+    # its labels are used and annotation_folder is ignored.
+    shards = open_shards(image_folder) if is_shard_path(image_folder) else None
+    if shards is not None and incremental:
+        shards.close()
+        raise ValueError("Incremental runs need an image folder, not a packed dataset")
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    save_images = result_option in ["Images", "Both"]
+    save_video = result_option in ["Video", "Both"]
+    video_output_path = os.path.join(output_folder, 'annotated_video.mp4')
+    out = None
+    frame_size = None
+
+    if shards is not None:
+        image_filenames = sorted(shards.filenames)
+        label_index = shards.labels
+    else:
+        # Sorted so the video frames follow the filename order
+        image_filenames = [f for f in sorted(os.listdir(image_folder))
+                           if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+
+        # All label files are parsed up front into one array; malformed lines are reported, not fatal
+        with metrics.timer('annotate.load_labels'):
+            label_index = load_labels(annotation_folder, cache_path=label_cache)
+        report_label_errors(label_index)
+
+    manifest = None
+    changed = None
+    if incremental:
+        params = {'tool': 'annotate', 'images': os.path.abspath(image_folder),
+                  'labels': os.path.abspath(annotation_folder), 'result_option': result_option,
+                  'fps': fps, 'fit_mode': fit_mode}
+        manifest = IncrementalManifest(output_folder, params, hash_contents=hash_contents)
+        label_files = list_label_files(annotation_folder)
+        inputs = {}
+        for image_filename in image_filenames:
+            label_file = label_files.get(os.path.splitext(image_filename)[0])
+            inputs[image_filename] = (os.path.join(image_folder, image_filename),
+                                      label_file.path if label_file else None)
+        changed = set(manifest.plan(inputs))
+        metrics.count('annotate.unchanged', len(inputs) - len(changed))
+        metrics.count('annotate.removed', len(manifest.removed))
+        print(f"{len(changed)} new or changed image(s), {len(inputs) - len(changed)} unchanged, "
+              f"{len(manifest.removed)} removed")
+        if not save_video:
+            image_filenames = [f for f in image_filenames if f in changed]
+        elif not changed and not manifest.removed and os.path.exists(video_output_path):
+            image_filenames = []
+    else:
+        discard_manifest(output_folder)
+
+    def jobs():
+        for image_filename in image_filenames:
+            if shards is not None:
+                image_path = shards.read(shards.index_of(image_filename))
+            else:
+                image_path = os.path.join(image_folder, image_filename)
+            boxes = label_index.get(os.path.splitext(image_filename)[0])
+            # Unchanged images are only drawn for the video; their annotated copies are current
+            write_image = save_images and (changed is None or image_filename in changed)
+            output_path = os.path.join(output_folder, image_filename) if write_image else None
+            yield image_path, boxes, output_path
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    if workers == 1:
+        results = (annotate_image(*job) for job in jobs())
+        executor = None
+    else:
+        # Bounded number of in-flight images caps memory; futures are consumed in
+        # submission order, which acts as the reorder buffer for the video.
+        max_pending = max_pending or workers * 2
+        executor = ThreadPoolExecutor(max_workers=workers)
+        results = _ordered_results(executor, jobs(), max_pending)
+
+    try:
+        with metrics.session():
+            def record(image_filename):
+                outputs = [os.path.join(output_folder, image_filename)] if save_images else []
+                manifest.record(image_filename, outputs)
+
+            # With a video, images are recorded only once the video is complete too
+            done = []
+            for image_filename, image in zip(image_filenames, results):
+                if image is not None and manifest is not None:
+                    if save_video:
+                        done.append(image_filename)
+                    else:
+                        record(image_filename)
+                if image is None or not save_video:
+                    continue
+                # Stream the frame into the video if user selected "Video" or "Both".
+                # The writer is opened on the first frame, so only a few frames are held in memory.
+                if out is None:
+                    height, width, _ = image.shape
+                    frame_size = (width, height)
+                    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                    out = cv2.VideoWriter(video_output_path, fourcc, fps, frame_size)
+                with metrics.timer('annotate.write_video'):
+                    out.write(fit_frame(image, frame_size, fit_mode))
+            if out is not None:
+                out.release()
+                out = None
+                print(f"Annotated video saved: {video_output_path}")
+            for image_filename in done:
+                record(image_filename)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if out is not None:
+            out.release()
+            print(f"Annotated video saved: {video_output_path}")
+        if manifest is not None:
+            manifest.close()
+        if shards is not None:
+            shards.close()
+
+def class_palette(num_classes):
+    # One distinct BGR color per class id: hues spread by the golden ratio, so
+    # neighbouring ids never get similar colors and the palette is the same every run
+    hues = (np.arange(max(num_classes, 1)) * 0.618033988749895 % 1.0 * 180).astype(np.uint8)
+    hsv = np.stack([hues, np.full_like(hues, 220), np.full_like(hues, 255)], axis=1)[None]
+    return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0]
+
+def review_tile(image_path, boxes, reduction, tile_size, palette, caption=None):
+    # Thumbnail of one image with its boxes for the review mode: decoded at
+    # 1/reduction resolution, letterboxed into tile_size and drawn at tile resolution
+    # (box corners for the whole image are computed in one vectorized step).
+    # image_path may also be the encoded image itself. None if it cannot be decoded.
+    with metrics.timer('review.decode'):
+        flags = REDUCED_DECODE_FLAGS[reduction]
+        if isinstance(image_path, str):
+            image = cv2.imread(image_path, flags)
+        else:
+            image = cv2.imdecode(image_path, flags)
+    if image is None:
+        metrics.count('review.unreadable')
+        return None
+
+    with metrics.timer('review.draw'):
+        tile_width, tile_height = tile_size
+        height, width = image.shape[:2]
+        scale = min(tile_width / width, tile_height / height)
+        new_width = max(1, int(round(width * scale)))
+        new_height = max(1, int(round(height * scale)))
+        left = (tile_width - new_width) // 2
+        top = (tile_height - new_height) // 2
+        tile = np.zeros((tile_height, tile_width, 3), dtype=np.uint8)
+        tile[top:top + new_height, left:left + new_width] = cv2.resize(image, (new_width, new_height),
+                                                                      interpolation=cv2.INTER_AREA)
+        if len(boxes):
+            corners = (boxes_to_pixels(boxes, new_width, new_height) + (left, top, left, top)).tolist()
+            class_ids = boxes[:, 0].astype(np.int64)
+            colors = palette[np.minimum(class_ids, len(palette) - 1)].tolist()
+            for class_id, (x1, y1, x2, y2), color in zip(class_ids.tolist(), corners, colors):
+                cv2.rectangle(tile, (x1, y1), (x2, y2), color, 1)
+                cv2.putText(tile, str(class_id), (x1 + 2, max(y1 - 3, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.35,
+                            color, 1, cv2.LINE_AA)
+        if caption:
+            # About 6 px per character at this font scale
+            cv2.putText(tile, caption[:max(1, tile_width // 6)], (3, tile_height - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (255, 255, 255), 1,
+                        cv2.LINE_AA)
+    metrics.count('review.images')
+    return tile
+
+def review_annotations(image_folder, annotation_folder, output_folder, result_option="Images", columns=8, rows=6,
+                       tile_size=(256, 192), reduction=4, fps=2, quality=85, workers=1, max_pending=None,
+                       label_cache=None):
+    # Fast review of a whole dataset: every image becomes a small tile with its boxes
+    # in per-class colors (see review_tile) and columns x rows tiles are packed into
+    # one contact sheet, in filename order. "Images" writes the sheets as JPEGs
+    # (contact_sheet_0000.jpg, ...), "Video" as the frames of review_video.mp4 at fps
+    # sheets per second, "Both" does both; columns=rows=1 gives a low-res video with
+    # one image per frame. Nothing is written at full resolution.
+    # image_folder may also be a packed dataset or a split of one, as in draw_annotations.
+    # Returns the number of sheets.
+    if reduction not in REDUCED_DECODE_FLAGS:
+        raise ValueError(f"reduction must be one of: {', '.join(map(str, REDUCED_DECODE_FLAGS))}")
+    shards = open_shards(image_folder) if is_shard_path(image_folder) else None
+    if shards is not None:
+        image_filenames = sorted(shards.filenames)
+        label_index = shards.labels
+    else:
+        image_filenames = [f for f in sorted(os.listdir(image_folder))
+                           if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+        with metrics.timer('review.load_labels'):
+            label_index = load_labels(annotation_folder, cache_path=label_cache)
+        report_label_errors(label_index)
+    os.makedirs(output_folder, exist_ok=True)
+
+    save_sheets = result_option in ["Images", "Both"]
+    save_video = result_option in ["Video", "Both"]
+    palette = class_palette(label_index.num_classes())
+    tile_width, tile_height = tile_size
+    per_sheet = columns * rows
+    video_output_path = os.path.join(output_folder, 'review_video.mp4')
+    out = None
+
+    def jobs():
+        for image_filename in image_filenames:
+            if shards is not None:
+                image_path = shards.read(shards.index_of(image_filename))
+            else:
+                image_path = os.path.join(image_folder, image_filename)
+            boxes = label_index.get(os.path.splitext(image_filename)[0])
+            yield image_path, boxes, reduction, tile_size, palette, image_filename
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    if executor is None:
+        results = (review_tile(*job) for job in jobs())
+    else:
+        results = _ordered_results(executor, jobs(), max_pending or workers * 4, review_tile)
+
+    sheet = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+    sheet_count = 0
+    filled = 0
+
+    def flush():
+        nonlocal out, sheet_count, filled
+        if save_sheets:
+            with metrics.timer('review.write_sheet'):
+                cv2.imwrite(os.path.join(output_folder, f'contact_sheet_{sheet_count:04d}.jpg'), sheet,
+                            [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if save_video:
+            if out is None:
+                out = cv2.VideoWriter(video_output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps,
+                                      (sheet.shape[1], sheet.shape[0]))
+            with metrics.timer('review.write_video'):
+                out.write(sheet)
+        metrics.count('review.sheets')
+        sheet_count += 1
+        filled = 0
+        sheet[:] = 0
+
+    try:
+        with metrics.session():
+            for tile in results:
+                if tile is None:
+                    continue
+                row, column = divmod(filled, columns)
+                sheet[row * tile_height:(row + 1) * tile_height, column * tile_width:(column + 1) * tile_width] = tile
+                filled += 1
+                if filled == per_sheet:
+                    flush()
+            if filled:
+                flush()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if out is not None:
+            out.release()
+            print(f"Review video saved: {video_output_path}")
+        if shards is not None:
+            shards.close()
+    return sheet_count
+
+def _ordered_results(executor, jobs, max_pending, function=annotate_image):
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(function, *job))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
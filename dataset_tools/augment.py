@@ -0,0 +1,132 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+from .labels import load_labels, report_label_errors
+
+# Geometric transforms that map an image onto itself without losing pixels.
+# Combinations are written as names joined with '+', applied left to right,
+# e.g. 'hflip+rot90' flips horizontally and then rotates 90 degrees clockwise.
+PRIMITIVES = ('hflip', 'vflip', 'rot90', 'rot180', 'rot270')
+
+# Output filename prefix for each primitive; combinations concatenate them
+PREFIXES = {
+    'hflip': 'fl_',
+    'vflip': 'vfl_',
+    'rot90': 'r90_',
+    'rot180': 'r180_',
+    'rot270': 'r270_',
+}
+
+_IMAGE_OPS = {
+    'hflip': lambda image: cv2.flip(image, 1),
+    'vflip': lambda image: cv2.flip(image, 0),
+    'rot90': lambda image: cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE),
+    'rot180': lambda image: cv2.rotate(image, cv2.ROTATE_180),
+    'rot270': lambda image: cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE),
+}
+
+def parse_transform(name):
+    steps = tuple(step.strip() for step in name.split('+') if step.strip())
+    if not steps:
+        raise ValueError("Empty transform name")
+    for step in steps:
+        if step not in _IMAGE_OPS:
+            raise ValueError(f"Unknown transform '{step}', expected one of: {', '.join(PRIMITIVES)}")
+    return steps
+
+def transform_prefix(name):
+    return ''.join(PREFIXES[step] for step in parse_transform(name))
+
+def resolve_variants(transforms, prefix='fl_'):
+    # [(transform, output prefix)]; `prefix` keeps naming the plain horizontal flip
+    return [(name, prefix if name == 'hflip' else transform_prefix(name)) for name in transforms]
+
+def transform_image(image, name):
+    for step in parse_transform(name):
+        image = _IMAGE_OPS[step](image)
+    return image
+
+def transform_boxes(boxes, name):
+    # Rows are class_id center_x center_y box_width box_height (normalized), so
+    # every transform is a handful of column operations over the whole array
+    result = np.array(boxes, dtype=np.float32).reshape(-1, 5)
+    for step in parse_transform(name):
+        x = result[:, 1].copy()
+        y = result[:, 2].copy()
+        if step == 'hflip':
+            result[:, 1] = 1 - x
+        elif step == 'vflip':
+            result[:, 2] = 1 - y
+        elif step == 'rot180':
+            result[:, 1] = 1 - x
+            result[:, 2] = 1 - y
+        else:
+            # 90 degree rotations swap the axes and the box width/height
+            if step == 'rot90':
+                result[:, 1] = 1 - y
+                result[:, 2] = x
+            else:
+                result[:, 1] = y
+                result[:, 2] = 1 - x
+            result[:, [3, 4]] = result[:, [4, 3]]
+    return result
+
+# Virtual augmentation: instead of writing transformed copies of every image, a
+# JSON-lines manifest records the source image, the transform and the already
+# transformed labels. VirtualAugmentDataset applies the transform when a sample is read.
+MANIFEST_FILENAME = 'augment_manifest.jsonl'
+
+def write_virtual_manifest(image_folder, label_folder, manifest_path, transforms=('hflip',), prefix='fl_'):
+    variants = resolve_variants(transforms, prefix)
+    label_index = load_labels(label_folder)
+    report_label_errors(label_index)
+    variant_indexes = [label_index.with_boxes(transform_boxes(label_index.boxes, name)) for name, _ in variants]
+
+    manifest_folder = os.path.dirname(os.path.abspath(manifest_path))
+    if not os.path.exists(manifest_folder):
+        os.makedirs(manifest_folder)
+
+    count = 0
+    with open(manifest_path, 'w') as manifest:
+        for filename in sorted(os.listdir(image_folder)):
+            if not filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+                continue
+            image_path = os.path.abspath(os.path.join(image_folder, filename))
+            annotation_name = os.path.splitext(filename)[0]
+            for (name, variant_prefix), variant_index in zip(variants, variant_indexes):
+                record = {
+                    'name': variant_prefix + filename,
+                    'image': image_path,
+                    'transform': name,
+                    # None when the source has no label file, [] when it has one without boxes
+                    'labels': (np.round(variant_index.get(annotation_name).astype(np.float64), 6).tolist()
+                               if annotation_name in label_index else None),
+                }
+                manifest.write(json.dumps(record) + '\n')
+                count += 1
+    return count
+
+class VirtualAugmentDataset:
+    # Reads a manifest written by write_virtual_manifest and yields
+    # (name, image, boxes) with the transform applied on the fly
+    def __init__(self, manifest_path):
+        with open(manifest_path, 'r') as manifest:
+            self.records = [json.loads(line) for line in manifest if line.strip()]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        record = self.records[i]
+        image = cv2.imread(record['image'])
+        if image is None:
+            raise FileNotFoundError(f"Could not read image: {record['image']}")
+        boxes = np.array(record['labels'] or [], dtype=np.float32).reshape(-1, 5)
+        return record['name'], transform_image(image, record['transform']), boxes
+
+    def __iter__(self):
+        for i in range(len(self.records)):
+            yield self[i]
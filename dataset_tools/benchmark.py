@@ -0,0 +1,258 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # Windows has no getrusage; peak RSS is reported as None there
+    resource = None
+
+BENCHMARKS = ('annotate', 'flip', 'split', 'extract', 'build')
+
+# Default relative slowdown (or memory growth) tolerated before a result counts as a regression
+DEFAULT_TOLERANCE = 0.10
+
+def make_dataset(folder, count=200, size=(640, 480), num_classes=10, max_boxes=8, image_format='jpg', seed=0):
+    # Synthetic YOLO dataset: folder/images with `count` images of filled shapes on a
+    # noisy gradient (compresses like a photo, unlike pure noise) and folder/labels with
+    # one label file per image whose boxes match the drawn shapes
+    rng = np.random.default_rng(seed)
+    width, height = size
+    image_folder = os.path.join(folder, 'images')
+    label_folder = os.path.join(folder, 'labels')
+    os.makedirs(image_folder, exist_ok=True)
+    os.makedirs(label_folder, exist_ok=True)
+    gradient = np.linspace(0, 160, width, dtype=np.float32)[None, :, None]
+    for i in range(count):
+        noise = rng.normal(0, 12, (height, width, 3)).astype(np.float32)
+        image = np.clip(gradient + noise + rng.integers(0, 80, 3), 0, 255).astype(np.uint8)
+        lines = []
+        for _ in range(int(rng.integers(1, max_boxes + 1))):
+            box_width, box_height = rng.uniform(0.05, 0.4, 2)
+            center_x = rng.uniform(box_width / 2, 1 - box_width / 2)
+            center_y = rng.uniform(box_height / 2, 1 - box_height / 2)
+            class_id = int(rng.integers(0, num_classes))
+            top_left = (int((center_x - box_width / 2) * width), int((center_y - box_height / 2) * height))
+            bottom_right = (int((center_x + box_width / 2) * width), int((center_y + box_height / 2) * height))
+            color = tuple(int(c) for c in rng.integers(0, 256, 3))
+            cv2.rectangle(image, top_left, bottom_right, color, -1)
+            lines.append(f"{class_id} {center_x:.6f} {center_y:.6f} {box_width:.6f} {box_height:.6f}\n")
+        name = f'synthetic_{i:06d}'
+        cv2.imwrite(os.path.join(image_folder, f'{name}.{image_format}'), image)
+        with open(os.path.join(label_folder, f'{name}.txt'), 'w') as label_file:
+            label_file.writelines(lines)
+    return image_folder, label_folder
+
+def make_video(path, frames=600, size=(640, 480), fps=30, seed=0):
+    # Synthetic mp4 with a moving square and a frame counter, so consecutive frames differ
+    rng = np.random.default_rng(seed)
+    width, height = size
+    background = np.clip(rng.normal(100, 20, (height, width, 3)), 0, 255).astype(np.uint8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    if not writer.isOpened():
+        raise IOError(f"Could not create video: {path}")
+    side = max(8, min(width, height) // 6)
+    try:
+        for i in range(frames):
+            frame = background.copy()
+            x = (i * 7) % max(1, width - side)
+            y = (i * 3) % max(1, height - side)
+            cv2.rectangle(frame, (x, y), (x + side, y + side), (0, 200, 255), -1)
+            cv2.putText(frame, str(i), (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+def peak_rss_mb():
+    # Peak resident set size of this process in MiB. On Linux VmHWM is read because
+    # ru_maxrss survives exec(), so a freshly spawned process would report its parent's peak.
+    try:
+        with open('/proc/self/status', 'r') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _run_tool(name, data_folder, work_folder, settings):
+    # One benchmark, run in a fresh process so its peak RSS is its own.
+    # Returns (items, unit, {stage: seconds}).
+    stages = {}
+    start = time.perf_counter()
+    from .annotate import draw_annotations
+    from .extraction import extract_frames
+    from .flip import process_images_with_flip
+    from .pipeline import build_dataset
+    from .split import split_dataset
+    stages['import'] = time.perf_counter() - start
+
+    image_folder = os.path.join(data_folder, 'images')
+    label_folder = os.path.join(data_folder, 'labels')
+    video_path = os.path.join(data_folder, 'synthetic.mp4')
+    output = os.path.join(work_folder, name)
+    workers = settings['workers']
+    # Counted from the data, which may be a reused --data folder of another size
+    images = len(os.listdir(image_folder))
+    cap = cv2.VideoCapture(video_path)
+    video_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    start = time.perf_counter()
+    if name == 'annotate':
+        draw_annotations(image_folder, label_folder, output, 'Both', workers=workers)
+        items, unit = images, 'images'
+    elif name == 'flip':
+        process_images_with_flip(image_folder, label_folder, output, transforms=('hflip', 'rot90'), workers=workers)
+        items, unit = images * 2, 'images'
+    elif name == 'split':
+        # Links leave the shared synthetic data untouched for the other benchmarks
+        split_dataset(image_folder, label_folder, output, 0.8, mode='hardlink', seed=0, test_ratio=0.1,
+                      stratify=True, label_workers=workers)
+        items, unit = images, 'images'
+    elif name == 'extract':
+        # Every frame is decoded; items count decoded frames, not saved ones
+        extract_frames(video_path, output, frame_interval=settings['frame_interval'], target_width=640,
+                       target_height=640, workers=workers)
+        items, unit = video_frames, 'frames'
+    elif name == 'build':
+        build_dataset([video_path], output, frame_interval=settings['frame_interval'],
+                      transforms=('hflip',), seed=0, transform_workers=workers)
+        items, unit = video_frames, 'frames'
+    else:
+        raise ValueError(f"Unknown benchmark '{name}', expected one of: {', '.join(BENCHMARKS)}")
+    stages['run'] = time.perf_counter() - start
+    start = time.perf_counter()
+    shutil.rmtree(output, ignore_errors=True)
+    stages['cleanup'] = time.perf_counter() - start
+    return items, unit, stages
+
+def _benchmark_process(name, data_folder, work_folder, settings):
+    from .metrics import metrics
+    # OpenCV's default thread pool, as the tools run outside the benchmark
+    cv2.setNumThreads(0)
+    # The tools print periodic progress summaries; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        # The tools reset the registry when their session ends; the benchmark's own
+        # session around the run keeps their stage timings until they are read below
+        with metrics.session():
+            items, unit, stages = _run_tool(name, data_folder, work_folder, settings)
+            # Time spent in every instrumented stage (decode, draw, encode, ...), summed over
+            # all threads, so it can exceed the wall-clock run time
+            for stage, histogram in metrics.snapshot()['histograms'].items():
+                stages[stage] = histogram['sum']
+    seconds = stages['run']
+    return {
+        'items': items,
+        'unit': unit,
+        'seconds': seconds,
+        'per_second': items / seconds if seconds > 0 else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': stages,
+    }
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def run_benchmarks(names=BENCHMARKS, images=200, image_size=(640, 480), video_frames=600, frame_interval=10,
+                   workers=None, repeat=1, data_folder=None):
+    # Generate the synthetic data once, then run every named benchmark `repeat` times,
+    # each in a fresh process, and keep the fastest run of each.
+    # Returns a JSON-serialisable report (see compare() for using it as a baseline).
+    settings = {
+        'images': images,
+        'image_size': list(image_size),
+        'video_frames': video_frames,
+        'frame_interval': frame_interval,
+        'workers': workers or os.cpu_count() or 1,
+    }
+    temporary = tempfile.mkdtemp(prefix='dataset_tools_bench_')
+    data_folder = data_folder or os.path.join(temporary, 'data')
+    work_folder = os.path.join(temporary, 'work')
+    generate = {}
+    try:
+        start = time.perf_counter()
+        if not os.path.isdir(os.path.join(data_folder, 'images')):
+            make_dataset(data_folder, images, image_size)
+        generate['dataset'] = time.perf_counter() - start
+        start = time.perf_counter()
+        video_path = os.path.join(data_folder, 'synthetic.mp4')
+        if not os.path.exists(video_path):
+            make_video(video_path, video_frames, image_size)
+        generate['video'] = time.perf_counter() - start
+
+        results = {}
+        context = multiprocessing.get_context('spawn')
+        for name in names:
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    runs.append(executor.submit(_benchmark_process, name, data_folder, work_folder, settings).result())
+            results[name] = min(runs, key=lambda run: run['seconds'])
+            print(f"{name}: {format_result(results[name])}", file=sys.stderr)
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+    return {'settings': settings, 'environment': environment(), 'generate_seconds': generate, 'results': results}
+
+def format_result(result):
+    rss = f", peak RSS {result['peak_rss_mb']:.0f} MiB" if result.get('peak_rss_mb') else ""
+    return f"{result['per_second']:.1f} {result['unit']}/s ({result['seconds']:.2f} s{rss})"
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    # Compare a report with a baseline report. A benchmark regresses when its throughput
+    # drops, or its peak RSS grows, by more than `tolerance` (relative).
+    # Returns (lines of a comparison table, names of the regressed benchmarks).
+    lines = [f"{'benchmark':<10}{'baseline':>14}{'current':>14}{'change':>10}{'rss change':>12}"]
+    regressions = []
+    for name, result in report['results'].items():
+        reference = baseline.get('results', {}).get(name)
+        if reference is None or not reference.get('per_second') or not result.get('per_second'):
+            lines.append(f"{name:<10}{'-':>14}{result.get('per_second') or 0:>14.1f}{'new':>10}")
+            continue
+        change = result['per_second'] / reference['per_second'] - 1
+        rss_change = None
+        if result.get('peak_rss_mb') and reference.get('peak_rss_mb'):
+            rss_change = result['peak_rss_mb'] / reference['peak_rss_mb'] - 1
+        regressed = change < -tolerance or (rss_change is not None and rss_change > tolerance)
+        if regressed:
+            regressions.append(name)
+        rss_text = f"{rss_change:+.1%}" if rss_change is not None else "-"
+        lines.append(f"{name:<10}{reference['per_second']:>14.1f}{result['per_second']:>14.1f}"
+                     f"{change:>+10.1%}{rss_text:>12}" + ("  REGRESSION" if regressed else ""))
+        if regressed:
+            # Stages whose time grew by more than the tolerance point at the cause
+            for stage, seconds in sorted(result.get('stages', {}).items()):
+                before = reference.get('stages', {}).get(stage)
+                if before and seconds / before - 1 > tolerance:
+                    lines.append(f"  {stage:<28}{before:>10.3f} s{seconds:>10.3f} s{seconds / before - 1:>+10.1%}")
+    return lines, regressions
+
+def load_report(path):
+    with open(path, 'r') as report_file:
+        return json.load(report_file)
+
+def save_report(report, path):
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
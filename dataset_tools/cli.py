@@ -0,0 +1,384 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from .metrics import metrics
+
+# Command-line entry points of the tools. The processing modules (and with them
+# cv2 and numpy) are imported only after the arguments are parsed, so --help and
+# argument errors return immediately and nothing here needs a display.
+# Every command reports through dataset_tools.metrics: a progress summary every
+# --summary-interval seconds and, on request, a JSON or Prometheus textfile export.
+
+IMAGE_FORMAT_CHOICES = ['png', 'jpg', 'webp']
+
+def _workers(value):
+    workers = int(value)
+    if workers <= 0:
+        raise argparse.ArgumentTypeError("must be a positive integer")
+    return workers
+
+def _parse(parser, argv):
+    # Parse with the metrics options every command shares and configure the registry
+    group = parser.add_argument_group('metrics')
+    group.add_argument('--metrics-json', default=None, help="write counters and stage timings to this JSON file")
+    group.add_argument('--metrics-prom', default=None, help="write them in Prometheus textfile format")
+    group.add_argument('--summary-interval', type=float, default=None,
+                       help="seconds between progress summaries (default: 10)")
+    group.add_argument('--no-metrics', action='store_true', help="no instrumentation, no progress summaries")
+    args = parser.parse_args(argv)
+    metrics.configure(enabled=not args.no_metrics, interval=args.summary_interval,
+                      json_path=args.metrics_json, prometheus_path=args.metrics_prom)
+    return args
+
+def annotate_main(argv=None):
+    parser = argparse.ArgumentParser(prog='draw-annotations',
+                                     description="Draw YOLO boxes onto images and/or into a video.")
+    parser.add_argument('images', help="image folder, packed dataset or split index (see pack)")
+    parser.add_argument('labels', help="YOLO label folder (unused for a packed dataset)")
+    parser.add_argument('output', help="output folder")
+    parser.add_argument('--result', choices=['images', 'video', 'both'], default='images')
+    parser.add_argument('--fps', type=int, default=10, help="video frame rate (default: 10)")
+    parser.add_argument('--fit', choices=['letterbox', 'resize'], default='letterbox',
+                        help="how frames of another size are fitted into the video")
+    parser.add_argument('--workers', type=_workers, default=os.cpu_count() or 1)
+    parser.add_argument('--label-cache', default=None, help="cache file for the parsed labels")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only process new or changed images, remove outputs of deleted ones")
+    parser.add_argument('--hash-contents', action='store_true',
+                        help="with --incremental, also skip files whose mtime changed but whose content did not")
+    args = _parse(parser, argv)
+
+    from .annotate import draw_annotations
+    try:
+        draw_annotations(args.images, args.labels, args.output, args.result.capitalize(), fps=args.fps,
+                         fit_mode=args.fit, workers=args.workers, label_cache=args.label_cache,
+                         incremental=args.incremental, hash_contents=args.hash_contents)
+    except ValueError as error:
+        parser.error(str(error))
+    return 0
+
+def review_main(argv=None):
+    parser = argparse.ArgumentParser(prog='review-annotations',
+                                     description="Pack low-resolution annotated thumbnails into contact sheets "
+                                                 "and/or a review video.")
+    parser.add_argument('images', help="image folder, packed dataset or split index (see pack)")
+    parser.add_argument('labels', help="YOLO label folder (unused for a packed dataset)")
+    parser.add_argument('output', help="output folder")
+    parser.add_argument('--result', choices=['images', 'video', 'both'], default='images',
+                        help="contact sheet JPEGs, a video of the sheets, or both (default: images)")
+    parser.add_argument('--columns', type=_workers, default=8, help="tiles per sheet row (default: 8)")
+    parser.add_argument('--rows', type=_workers, default=6, help="tile rows per sheet (default: 6)")
+    parser.add_argument('--tile', type=_workers, nargs=2, default=(256, 192), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--reduction', type=int, choices=[1, 2, 4, 8], default=4,
+                        help="decode images at 1/N resolution (default: 4)")
+    parser.add_argument('--fps', type=float, default=2, help="sheets per second of the video (default: 2)")
+    parser.add_argument('--quality', type=int, default=85, help="JPEG quality of the sheets (default: 85)")
+    parser.add_argument('--workers', type=_workers, default=os.cpu_count() or 1)
+    parser.add_argument('--label-cache', default=None, help="cache file for the parsed labels")
+    args = _parse(parser, argv)
+
+    from .annotate import review_annotations
+    try:
+        count = review_annotations(args.images, args.labels, args.output, args.result.capitalize(),
+                                   columns=args.columns, rows=args.rows, tile_size=tuple(args.tile),
+                                   reduction=args.reduction, fps=args.fps, quality=args.quality,
+                                   workers=args.workers, label_cache=args.label_cache)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"{count} contact sheet(s) saved to: {args.output}")
+    return 0
+
+def flip_main(argv=None):
+    parser = argparse.ArgumentParser(prog='flip-dataset',
+                                     description="Write flipped/rotated copies of images and their labels.")
+    parser.add_argument('images', help="image folder, packed dataset or split index (see pack)")
+    parser.add_argument('labels', help="YOLO label folder (unused for a packed dataset)")
+    parser.add_argument('output', help="output folder")
+    parser.add_argument('-t', '--transform', dest='transforms', action='append', default=None,
+                        help="transform to apply, repeatable: hflip, vflip, rot90, rot180, rot270 "
+                             "or a '+' combination such as hflip+rot90 (default: hflip)")
+    parser.add_argument('--prefix', default='fl_', help="filename prefix of a single hflip variant (default: fl_)")
+    parser.add_argument('--format', dest='image_format', choices=IMAGE_FORMAT_CHOICES, default=None,
+                        help="output image format (default: same as input)")
+    parser.add_argument('--quality', type=int, default=None, help="JPEG/WebP quality 0-100 or PNG compression 0-9")
+    parser.add_argument('--workers', type=_workers, default=os.cpu_count() or 1)
+    parser.add_argument('--virtual', action='store_true',
+                        help="only write an augmentation manifest, no image copies")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only process new or changed images, remove outputs of deleted ones")
+    parser.add_argument('--hash-contents', action='store_true',
+                        help="with --incremental, also skip files whose mtime changed but whose content did not")
+    args = _parse(parser, argv)
+    transforms = args.transforms or ['hflip']
+
+    if args.virtual:
+        from .augment import MANIFEST_FILENAME, write_virtual_manifest
+        manifest_path = os.path.join(args.output, MANIFEST_FILENAME)
+        try:
+            count = write_virtual_manifest(args.images, args.labels, manifest_path, transforms=transforms,
+                                           prefix=args.prefix)
+        except ValueError as error:
+            parser.error(str(error))
+        print(f"Virtual augmentation manifest with {count} samples saved to: {manifest_path}")
+        return 0
+
+    from .flip import process_images_with_flip
+    try:
+        process_images_with_flip(args.images, args.labels, args.output, prefix=args.prefix, transforms=transforms,
+                                 workers=args.workers, image_format=args.image_format, quality=args.quality,
+                                 incremental=args.incremental, hash_contents=args.hash_contents)
+    except ValueError as error:
+        parser.error(str(error))
+    return 0
+
+def split_main(argv=None):
+    parser = argparse.ArgumentParser(prog='split-dataset', description="Split a YOLO dataset into train/val(/test).")
+    parser.add_argument('images', help="image folder, packed dataset or split index (see pack)")
+    parser.add_argument('labels', help="YOLO label folder (unused for a packed dataset)")
+    parser.add_argument('output', help="output folder")
+    parser.add_argument('--train', type=float, default=0.8, help="training ratio (default: 0.8)")
+    parser.add_argument('--test', type=float, default=0.0, help="test ratio (default: 0, no test split)")
+    parser.add_argument('--mode', default='move',
+                        help="move, manifest (only train.txt/val.txt), hardlink or symlink (default: move); "
+                             "a packed dataset is always split into <split>.index.npz files")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument('--stratify', action='store_true', help="balance every class across the splits")
+    parser.add_argument('--label-workers', type=_workers, default=None)
+    args = _parse(parser, argv)
+
+    from .split import split_dataset
+    try:
+        with metrics.session():
+            splits = split_dataset(args.images, args.labels, args.output, args.train, mode=args.mode, seed=args.seed,
+                                   test_ratio=args.test, stratify=args.stratify, label_workers=args.label_workers)
+    except ValueError as error:
+        parser.error(str(error))
+    print(", ".join(f"{name}: {len(images)}" for name, images in splits.items()))
+    return 0
+
+def pack_main(argv=None):
+    parser = argparse.ArgumentParser(prog='pack-dataset',
+                                     description="Pack images and labels into tar shards with an offset index.")
+    parser.add_argument('images', help="image folder")
+    parser.add_argument('labels', help="YOLO label folder")
+    parser.add_argument('output', help="output folder for the shards and their index")
+    parser.add_argument('--shard-size', type=_workers, default=512, help="shard size in MiB (default: 512)")
+    parser.add_argument('--workers', type=_workers, default=8, help="threads reading the images (default: 8)")
+    args = _parse(parser, argv)
+
+    from .shards import pack_dataset
+    try:
+        count = pack_dataset(args.images, args.labels, args.output, shard_bytes=args.shard_size * 1024 * 1024,
+                             workers=args.workers)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"Packed {count} samples into: {args.output}")
+    return 0
+
+def unpack_main(argv=None):
+    parser = argparse.ArgumentParser(prog='unpack-dataset',
+                                     description="Write a packed dataset (or a split of one) back to files.")
+    parser.add_argument('shards', help="packed dataset folder or split index")
+    parser.add_argument('images', help="output image folder")
+    parser.add_argument('labels', help="output label folder")
+    args = _parse(parser, argv)
+
+    from .shards import is_shard_path, unpack_dataset
+    if not is_shard_path(args.shards):
+        parser.error(f"not a packed dataset or split index: {args.shards}")
+    count = unpack_dataset(args.shards, args.images, args.labels)
+    print(f"Unpacked {count} samples")
+    return 0
+
+def extract_main(argv=None):
+    parser = argparse.ArgumentParser(prog='extract-frames', description="Extract frames from many videos without the GUI.")
+    parser.add_argument('inputs', nargs='+', help="video files, directories or glob patterns")
+    parser.add_argument('-o', '--output-root', required=True, help="folder that receives one <video>_frames folder per video")
+    parser.add_argument('--interval', type=int, default=30, help="keep every N-th frame (default: 30)")
+    parser.add_argument('--every-seconds', type=float, default=None, help="keep one frame every N seconds instead")
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=640)
+    parser.add_argument('--format', dest='image_format', default='png', choices=IMAGE_FORMAT_CHOICES)
+    parser.add_argument('--quality', type=int, default=None, help="JPEG/WebP quality 0-100 or PNG compression 0-9")
+    parser.add_argument('--jobs', type=int, default=None, help="videos decoded concurrently (default: CPU count)")
+    parser.add_argument('--encoders', type=int, default=1, help="encoder threads per video (default: 1)")
+    parser.add_argument('--dedup', choices=['dhash', 'diff'], default=None, help="drop near-duplicate frames")
+    parser.add_argument('--dedup-threshold', type=float, default=None,
+                        help="max distance to count as a duplicate (dhash: differing bits, diff: 0-1)")
+    parser.add_argument('--scene-change', action='store_true',
+                        help="keep a frame only when it differs from the previous candidate (scene cuts)")
+    parser.add_argument('--force', action='store_true', help="re-extract videos that are already complete")
+    args = _parse(parser, argv)
+
+    from .extraction import process_videos
+    try:
+        with metrics.session():
+            results = process_videos(args.inputs, args.output_root, max_concurrent=args.jobs,
+                                     skip_complete=not args.force, frame_interval=args.interval,
+                                     target_width=args.width, target_height=args.height,
+                                     every_seconds=args.every_seconds, image_format=args.image_format,
+                                     quality=args.quality, workers=args.encoders, dedup_method=args.dedup,
+                                     dedup_threshold=args.dedup_threshold, scene_change=args.scene_change)
+    except ValueError as error:
+        parser.error(str(error))
+    failed = [path for path, result in results.items() if isinstance(result, Exception)]
+    return 1 if failed else 0
+
+def build_main(argv=None):
+    parser = argparse.ArgumentParser(prog='build-dataset',
+                                     description="Extract, augment and split frames of videos in one pass, "
+                                                 "writing each image once into its final split folder.")
+    parser.add_argument('inputs', nargs='+', help="video files, directories or glob patterns")
+    parser.add_argument('-o', '--output', required=True, help="dataset folder (images|labels/<split>/)")
+    parser.add_argument('--labels', default=None, help="optional label folder with <video>_frame_NNNN.txt files")
+    parser.add_argument('--interval', type=int, default=30, help="keep every N-th frame (default: 30)")
+    parser.add_argument('--every-seconds', type=float, default=None, help="keep one frame every N seconds instead")
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=640)
+    parser.add_argument('-t', '--transform', dest='transforms', action='append', default=None,
+                        help="augmentation to add, repeatable (default: hflip); see flip-dataset")
+    parser.add_argument('--no-original', action='store_true', help="write only the augmented variants")
+    parser.add_argument('--train', type=float, default=0.8, help="training ratio (default: 0.8)")
+    parser.add_argument('--test', type=float, default=0.0, help="test ratio (default: 0, no test split)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument('--format', dest='image_format', default='jpg', choices=IMAGE_FORMAT_CHOICES)
+    parser.add_argument('--quality', type=int, default=None, help="JPEG/WebP quality 0-100 or PNG compression 0-9")
+    parser.add_argument('--dedup', choices=['dhash', 'diff'], default=None, help="drop near-duplicate frames")
+    parser.add_argument('--decode-workers', type=_workers, default=1, help="videos decoded concurrently (default: 1)")
+    parser.add_argument('--transform-workers', type=_workers, default=None,
+                        help="threads transforming and encoding frames (default: CPU count)")
+    parser.add_argument('--write-workers', type=_workers, default=1, help="threads writing files (default: 1)")
+    parser.add_argument('--queue-size', type=_workers, default=None, help="items buffered between two stages")
+    args = _parse(parser, argv)
+
+    from .pipeline import build_dataset
+    try:
+        counts = build_dataset(args.inputs, args.output, labels_folder=args.labels, frame_interval=args.interval,
+                               every_seconds=args.every_seconds, target_width=args.width, target_height=args.height,
+                               transforms=args.transforms or ['hflip'], keep_original=not args.no_original,
+                               train_ratio=args.train, test_ratio=args.test, seed=args.seed,
+                               image_format=args.image_format, quality=args.quality, dedup_method=args.dedup,
+                               decode_workers=args.decode_workers, transform_workers=args.transform_workers,
+                               write_workers=args.write_workers, queue_size=args.queue_size)
+    except ValueError as error:
+        parser.error(str(error))
+    print(", ".join(f"{name}: {count}" for name, count in counts.items()))
+    return 0
+
+def record_main(argv=None):
+    parser = argparse.ArgumentParser(prog='record-streams',
+                                     description="Record RTSP streams headless, one supervised process per stream. "
+                                                 "Stop with Ctrl-C.")
+    parser.add_argument('urls', nargs='+', help="stream URLs")
+    parser.add_argument('--fps', type=int, default=10, help="output frame rate when re-encoding (default: 10)")
+    parser.add_argument('-o', '--output-dir', default='.', help="folder for the videos (default: current folder)")
+    parser.add_argument('--segment-minutes', type=float, default=5, help="segment length, 0 for one file (default: 5)")
+    parser.add_argument('--quota-gb', type=float, default=0, help="disk quota per stream, 0 for unlimited")
+    parser.add_argument('--passthrough', action='store_true', help="remux with ffmpeg instead of re-encoding")
+    parser.add_argument('--no-video', action='store_true', help="only sample images, record no video")
+    parser.add_argument('--sample-every', type=int, default=None, help="save every N-th frame as a training image")
+    parser.add_argument('--sample-seconds', type=float, default=None, help="save one training image every N seconds")
+    parser.add_argument('--sample-size', type=int, nargs=2, default=(640, 640), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--sample-format', choices=IMAGE_FORMAT_CHOICES, default='jpg')
+    args = _parse(parser, argv)
+    sampling = args.sample_every or args.sample_seconds
+    if args.no_video and not sampling:
+        parser.error("--no-video needs --sample-every or --sample-seconds")
+
+    config = {
+        'fps': args.fps,
+        'output_dir': args.output_dir,
+        'passthrough': args.passthrough,
+        'segment_seconds': args.segment_minutes * 60 or None,
+        'max_bytes': int(args.quota_gb * 1024 ** 3) or None,
+        'record_video': not args.no_video,
+    }
+    if sampling:
+        config['sample'] = {'target_width': args.sample_size[0], 'target_height': args.sample_size[1],
+                            'image_format': args.sample_format}
+        if args.sample_seconds:
+            config['sample']['every_seconds'] = args.sample_seconds
+        else:
+            config['sample']['frame_interval'] = args.sample_every
+
+    from .supervisor import StreamSupervisor
+    supervisor = StreamSupervisor()
+    for url in args.urls:
+        supervisor.start(url, dict(config, url=url))
+    # poll() publishes every stream's FPS, dropped frames and reconnects as gauges,
+    # which the periodic summary prints and the metrics exports write
+    try:
+        with metrics.session():
+            while True:
+                time.sleep(0.5)
+                health = supervisor.poll()
+                if all(stats['state'] in ('stopped', 'failed') for stats in health.values()):
+                    break
+    except KeyboardInterrupt:
+        print("Stopping...")
+    finally:
+        supervisor.shutdown()
+    return 0
+
+def bench_main(argv=None):
+    parser = argparse.ArgumentParser(prog='bench-dataset-tools',
+                                     description="Benchmark the tools on synthetic data and print a JSON report.")
+    parser.add_argument('benchmarks', nargs='*', default=None,
+                        help="benchmarks to run: annotate, flip, split, extract, build (default: all)")
+    parser.add_argument('--images', type=_workers, default=200, help="synthetic dataset size (default: 200)")
+    parser.add_argument('--size', type=int, nargs=2, default=(640, 480), metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--video-frames', type=_workers, default=600, help="synthetic video length (default: 600)")
+    parser.add_argument('--interval', type=_workers, default=10, help="frame interval for extraction (default: 10)")
+    parser.add_argument('--workers', type=_workers, default=None, help="worker threads per tool (default: CPU count)")
+    parser.add_argument('--repeat', type=_workers, default=1, help="runs per benchmark, the fastest counts")
+    parser.add_argument('--data', default=None, help="reuse/keep the synthetic data in this folder")
+    parser.add_argument('-o', '--output', default=None, help="write the JSON report here instead of stdout")
+    parser.add_argument('--baseline', default=None, help="JSON report to compare against")
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help="relative slowdown or memory growth counted as a regression (default: 0.10)")
+    args = _parse(parser, argv)
+
+    from .benchmark import BENCHMARKS, DEFAULT_TOLERANCE, compare, load_report, run_benchmarks, save_report
+    names = args.benchmarks or BENCHMARKS
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    report = run_benchmarks(names, images=args.images, image_size=tuple(args.size), video_frames=args.video_frames,
+                            frame_interval=args.interval, workers=args.workers, repeat=args.repeat,
+                            data_folder=args.data)
+    if args.output:
+        save_report(report, args.output)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        lines, regressions = compare(report, load_report(args.baseline),
+                                     DEFAULT_TOLERANCE if args.tolerance is None else args.tolerance)
+        print("\n".join(lines), file=sys.stderr)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+COMMANDS = {
+    'annotate': annotate_main,
+    'review': review_main,
+    'flip': flip_main,
+    'split': split_main,
+    'pack': pack_main,
+    'unpack': unpack_main,
+    'extract': extract_main,
+    'build': build_main,
+    'record': record_main,
+    'bench': bench_main,
+}
+
+def main(argv=None):
+    # python -m dataset_tools <command> [arguments]
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(f"usage: python -m dataset_tools {{{','.join(COMMANDS)}}} [-h] ...", file=sys.stderr)
+        return 0 if argv and argv[0] in ('-h', '--help') else 2
+    return COMMANDS[argv[0]](argv[1:])
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+
+# Default thresholds: differing bits out of hash_size * hash_size for 'dhash',
+# mean absolute difference (0-1) of the downsampled grey frames for 'diff'
+DEFAULT_THRESHOLDS = {
+    'dhash': 5,
+    'diff': 0.03,
+}
+
+class FrameDeduplicator:
+    # Decides per candidate frame whether it is worth saving, using a tiny
+    # signature computed on a downsampled greyscale copy (cheap next to encoding).
+    #   default:            drop frames within `threshold` of the last kept frame
+    #   scene_change=True:  keep a frame only when it differs from the previous
+    #                       candidate by more than `threshold`, i.e. on scene cuts
+    def __init__(self, method='dhash', threshold=None, scene_change=False, hash_size=8):
+        if method not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown dedup method '{method}', expected one of: {', '.join(DEFAULT_THRESHOLDS)}")
+        self.method = method
+        self.threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+        self.scene_change = scene_change
+        self.hash_size = hash_size
+        self.reference = None
+        self.dropped = 0
+
+    def signature(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self.method == 'dhash':
+            # Difference hash: is each pixel brighter than its right neighbour
+            small = cv2.resize(gray, (self.hash_size + 1, self.hash_size), interpolation=cv2.INTER_AREA)
+            return small[:, 1:] > small[:, :-1]
+        small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA)
+        return small.astype(np.float32) / 255
+
+    def distance(self, a, b):
+        if self.method == 'dhash':
+            return int(np.count_nonzero(a != b))
+        return float(np.abs(a - b).mean())
+
+    def should_keep(self, frame):
+        signature = self.signature(frame)
+        if self.reference is None:
+            self.reference = signature
+            return True
+        changed = self.distance(signature, self.reference) > self.threshold
+        if self.scene_change:
+            # Compare consecutive candidates so a gradual drift never triggers
+            self.reference = signature
+        elif changed:
+            self.reference = signature
+        if not changed:
+            self.dropped += 1
+        return changed
@@ -0,0 +1,99 @@
+import os
+import queue
+import threading
+
+import cv2
+
+from .metrics import metrics
+
+# Output formats selectable by the tools; None keeps the input file's format
+IMAGE_FORMATS = {
+    'png': '.png',
+    'jpg': '.jpg',
+    'jpeg': '.jpg',
+    'webp': '.webp',
+}
+
+def image_extension(image_format):
+    key = image_format.lower().lstrip('.')
+    if key not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format '{image_format}', expected one of: {', '.join(IMAGE_FORMATS)}")
+    return IMAGE_FORMATS[key]
+
+def output_filename(filename, image_format=None):
+    # Swap the extension when a different output format was requested
+    if not image_format:
+        return filename
+    return os.path.splitext(filename)[0] + image_extension(image_format)
+
+def encode_params(extension, quality=None):
+    # cv2.imwrite/imencode flags for an extension. `quality` is 0-100 for JPEG/WebP
+    # and the zlib compression level 0-9 for PNG (lower is faster, higher is smaller).
+    if quality is None:
+        return []
+    extension = extension.lower()
+    if extension in ('.jpg', '.jpeg'):
+        return [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if extension == '.webp':
+        return [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    if extension == '.png':
+        return [cv2.IMWRITE_PNG_COMPRESSION, int(quality)]
+    return []
+
+def encode_image(image, extension, params=None):
+    ok, buffer = cv2.imencode(extension, image, params or [])
+    if not ok:
+        raise ValueError(f"Could not encode image as {extension}")
+    return buffer
+
+def write_file(path, data):
+    # Encoded images are written as bytes, label files as text
+    with open(path, 'w' if isinstance(data, str) else 'wb') as file:
+        file.write(data)
+
+class EncoderPool:
+    # Worker threads that encode and write the images handed to submit(). cv2.imwrite
+    # releases the GIL, so encoding runs in parallel with the producer (e.g. a video
+    # decoder). The queue is bounded: submit() blocks when the encoders fall behind,
+    # which keeps at most max_queue frames in memory.
+    def __init__(self, workers=None, max_queue=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.queue = queue.Queue(maxsize=max_queue or self.workers * 2)
+        self.errors = []
+        self.threads = [threading.Thread(target=self._run, daemon=True) for _ in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            path, image, params = item
+            try:
+                with metrics.timer('encoder.encode'):
+                    written = cv2.imwrite(path, image, params)
+                if not written:
+                    raise IOError(f"Could not write image: {path}")
+            except Exception as error:
+                self.errors.append(error)
+
+    def submit(self, path, image, params=None):
+        if self.errors:
+            raise self.errors[0]
+        self.queue.put((path, image, params or []))
+
+    def close(self):
+        # Wait for all queued images to be written
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
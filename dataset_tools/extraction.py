@@ -0,0 +1,260 @@
+import collections
+import glob
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from .dedup import FrameDeduplicator
+from .encoding import EncoderPool, encode_params, image_extension
+from .metrics import metrics
+
+# Gaps of at least this many frames are skipped by seeking (decoding from the
+# nearest keyframe) instead of grabbing every frame in between
+SEEK_THRESHOLD = 300
+
+def frame_targets(frame_interval=30, every_seconds=None, fps=0, total_frames=0):
+    # Indices (0-based) of the frames to keep, in increasing order.
+    # By count: every frame_interval-th frame, i.e. frames frame_interval, 2 * frame_interval, ...
+    # By time: the first frame at or after every multiple of every_seconds.
+    if every_seconds:
+        if fps <= 0:
+            raise ValueError("Extracting by timestamp needs the video FPS")
+        last = -1
+        k = 0
+        while True:
+            target = int(round(k * every_seconds * fps))
+            k += 1
+            if total_frames and target >= total_frames:
+                return
+            if target > last:
+                last = target
+                yield target
+    else:
+        if frame_interval <= 0:
+            raise ValueError("frame_interval must be a positive integer")
+        target = frame_interval - 1
+        while not total_frames or target < total_frames:
+            yield target
+            target += frame_interval
+
+def iter_frames(cap, frame_interval=30, every_seconds=None, seek_threshold=SEEK_THRESHOLD, progress=None):
+    # Yields (frame_index, frame) for the kept frames only. Skipped frames are
+    # grab()bed, which demuxes and decodes but skips the colour conversion and copy;
+    # only kept frames are retrieve()d. Long gaps are skipped with a keyframe seek.
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    position = 0
+    can_seek = total_frames > 0
+    for target in frame_targets(frame_interval, every_seconds, fps, total_frames if can_seek else 0):
+        if seek_threshold and can_seek and target - position >= seek_threshold:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == target:
+                position = target
+            else:
+                # Backend cannot seek accurately; fall back to grabbing from here on
+                can_seek = False
+                cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+        while position < target:
+            if not cap.grab():
+                return
+            position += 1
+        if not cap.grab():
+            return
+        position += 1
+        ret, frame = cap.retrieve()
+        if progress is not None:
+            progress(position, total_frames)
+        if not ret:
+            return
+        yield target, frame
+
+def extract_frames(video_path, output_dir, frame_interval=30, target_width=0, target_height=0,
+                   every_seconds=None, seek_threshold=SEEK_THRESHOLD, progress=None,
+                   image_format='png', quality=None, workers=1, max_queue=None,
+                   dedup_method=None, dedup_threshold=None, scene_change=False):
+    # Save every frame_interval-th frame (or one frame every every_seconds) of a video
+    # into output_dir, resized to target_width x target_height when both are set.
+    # With workers > 1 the frames are encoded by an EncoderPool while decoding goes on.
+    # With dedup_method ('dhash' or 'diff') near-duplicate frames are dropped before
+    # they are resized or encoded (see FrameDeduplicator for scene_change).
+    # Returns the number of saved images.
+    extension = image_extension(image_format)
+    params = encode_params(extension, quality)
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video: {video_path}")
+
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    image_count = 0
+    encoder = EncoderPool(workers, max_queue) if workers > 1 else None
+    deduplicator = FrameDeduplicator(dedup_method, dedup_threshold, scene_change) if dedup_method else None
+    frames = iter_frames(cap, frame_interval, every_seconds, seek_threshold, progress)
+    with metrics.session():
+        try:
+            while True:
+                # Grabbing the skipped frames and retrieving the kept one
+                with metrics.timer('extract.decode'):
+                    item = next(frames, None)
+                if item is None:
+                    break
+                _, frame = item
+                if deduplicator is not None and not deduplicator.should_keep(frame):
+                    metrics.count('extract.duplicates')
+                    continue
+
+                # Resize only the frames that are saved
+                if target_width > 0 and target_height > 0:
+                    if frame.shape[1] != target_width or frame.shape[0] != target_height:
+                        with metrics.timer('extract.resize'):
+                            frame = cv2.resize(frame, (target_width, target_height), interpolation=cv2.INTER_AREA)
+
+                image_filename = os.path.join(output_dir, f'{video_name}_frame_{image_count:04d}{extension}')
+                if encoder is not None:
+                    # Only blocks while all encoders are busy; they time their own writes
+                    with metrics.timer('extract.queue_wait'):
+                        encoder.submit(image_filename, frame, params)
+                else:
+                    with metrics.timer('extract.encode'):
+                        cv2.imwrite(image_filename, frame, params)
+                metrics.count('extract.frames')
+                image_count += 1
+        finally:
+            cap.release()
+            if encoder is not None:
+                encoder.close()
+    if deduplicator is not None:
+        print(f'Dropped {deduplicator.dropped} near-duplicate frames of {video_path}')
+    return image_count
+
+# Batch extraction: many videos, one decoder per process
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+# Written into a video's output folder once all its frames are saved; holds the
+# extraction settings so a rerun with other settings extracts again
+DONE_MARKER = '.extraction_done.json'
+
+def find_videos(inputs):
+    # Video files from a mix of files, directories and glob patterns, sorted and
+    # de-duplicated by their real path ('v.mp4' and '.' name the same file once)
+    videos = {}
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            with os.scandir(pattern) as entries:
+                paths = [entry.path for entry in entries
+                         if entry.is_file() and entry.name.lower().endswith(VIDEO_EXTENSIONS)]
+        elif os.path.isfile(pattern):
+            paths = [pattern]
+        else:
+            paths = [path for path in glob.glob(pattern, recursive=True)
+                     if os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS)]
+        for path in paths:
+            videos.setdefault(os.path.realpath(path), path)
+    return sorted(videos.values())
+
+def video_names(videos):
+    # {video path: name of its outputs}: the file name without extension or, for videos
+    # that share one, their path relative to the folder they have in common
+    # (camA/clip.mp4 and camB/clip.mp4 -> camA_clip and camB_clip)
+    names = {video: os.path.splitext(os.path.basename(video))[0] for video in videos}
+    counts = collections.Counter(names.values())
+    clashing = [video for video in videos if counts[names[video]] > 1]
+    if clashing:
+        root = os.path.commonpath([os.path.dirname(os.path.realpath(video)) for video in clashing])
+        for video in clashing:
+            relative = os.path.relpath(os.path.splitext(os.path.realpath(video))[0], root)
+            names[video] = relative.replace(os.sep, '_')
+    counts = collections.Counter(names.values())
+    clashing = sorted(video for video in videos if counts[names[video]] > 1)
+    if clashing:
+        raise ValueError(f"Videos would write to the same output: {', '.join(clashing)}; rename them")
+    return names
+
+def video_output_dir(video_name, output_root):
+    return os.path.join(output_root, f'{video_name}_frames')
+
+def is_complete(output_dir, settings, video_path=None):
+    marker_path = os.path.join(output_dir, DONE_MARKER)
+    try:
+        with open(marker_path, 'r') as marker:
+            done = json.load(marker)
+        if video_path is not None and done.get('video') != os.path.abspath(video_path):
+            return False
+        return done.get('settings') == settings
+    except (OSError, ValueError):
+        return False
+
+def clear_previous_frames(output_dir, video_path):
+    # Remove the done marker and the frames of an earlier extraction of the video, so a
+    # rerun with other settings (or one that crashes) never leaves old and new frames mixed
+    try:
+        os.remove(os.path.join(output_dir, DONE_MARKER))
+    except FileNotFoundError:
+        pass
+    video_name = os.path.splitext(os.path.basename(video_path))[0]
+    for path in glob.glob(os.path.join(glob.escape(output_dir), glob.escape(video_name) + '_frame_*')):
+        if os.path.isfile(path):
+            os.remove(path)
+
+def _extract_video_job(video_path, output_dir, settings):
+    clear_previous_frames(output_dir, video_path)
+    with metrics.session():
+        image_count = extract_frames(video_path, output_dir, **settings)
+        # The session resets the registry when it ends; the parent reports the stage timings
+        histograms = metrics.snapshot()['histograms']
+    with open(os.path.join(output_dir, DONE_MARKER), 'w') as marker:
+        json.dump({'video': os.path.abspath(video_path), 'images': image_count, 'settings': settings}, marker)
+    return image_count, histograms
+
+def _init_batch_worker(metrics_enabled=True, metrics_interval=None):
+    # Parallelism comes from running one video per process; keep OpenCV's own
+    # thread pool from oversubscribing the cores
+    cv2.setNumThreads(1)
+    # Workers print their own summaries and hand their stage timings to the parent,
+    # which writes the exports
+    metrics.configure(enabled=metrics_enabled, interval=metrics_interval)
+
+def process_videos(inputs, output_root, max_concurrent=None, skip_complete=True, **settings):
+    # Extract frames from every video matched by inputs into output_root/<video>_frames
+    # (see video_names for videos that share a file name),
+    # decoding at most max_concurrent videos at a time (one per process). Videos whose
+    # output folder has a done marker with the same settings are skipped.
+    # Returns {video_path: image count, 'skipped' or the error}.
+    videos = find_videos(inputs)
+    output_dirs = {video_path: video_output_dir(name, output_root) for video_path, name in video_names(videos).items()}
+    results = {}
+    pending = []
+    for video_path in videos:
+        if skip_complete and is_complete(output_dirs[video_path], settings, video_path):
+            print(f'Skipping {video_path}: already extracted')
+            results[video_path] = 'skipped'
+        else:
+            pending.append(video_path)
+
+    if not pending:
+        return results
+    max_concurrent = max(1, min(max_concurrent or os.cpu_count() or 1, len(pending)))
+    # Spawned, not forked: a forked worker would inherit the parent's open metrics session
+    # and never report its own
+    with ProcessPoolExecutor(max_workers=max_concurrent, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_batch_worker,
+                             initargs=(metrics.enabled, metrics.interval)) as executor:
+        futures = {executor.submit(_extract_video_job, video_path, output_dirs[video_path], settings): video_path
+                   for video_path in pending}
+        for future in as_completed(futures):
+            video_path = futures[future]
+            try:
+                results[video_path], histograms = future.result()
+                metrics.merge_histograms(histograms)
+                metrics.count('extract.videos')
+                metrics.count('extract.frames', results[video_path])
+                print(f'Finished {video_path}: {results[video_path]} images')
+            except Exception as error:
+                results[video_path] = error
+                metrics.count('extract.failed_videos')
+                print(f'Failed {video_path}: {error}')
+    return results
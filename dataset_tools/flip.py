@@ -0,0 +1,208 @@
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from .augment import resolve_variants, transform_boxes, transform_image
+from .encoding import encode_image, encode_params, output_filename, write_file
+from .incremental import IncrementalManifest, discard_manifest
+from .labels import format_labels, list_label_files, load_labels, read_label_file, report_label_errors
+from .metrics import metrics
+from .shards import is_shard_path, open_shards
+
+def flip_image(image):
+    # Flip image horizontally
+    return transform_image(image, 'hflip')
+
+def flip_annotation(annotation_path, image_width):
+    boxes, errors = read_label_file(annotation_path)
+    for path, line_number, line in errors:
+        print(f"Skipped malformed label line {path}:{line_number}: {line.strip()!r}")
+    return format_labels(transform_boxes(boxes, 'hflip'))
+
+def process_images_with_flip(image_folder, label_folder, output_folder, prefix='fl_', transforms=('hflip',),
+                             workers=1, image_format=None, quality=None, queue_size=None, incremental=False,
+                             hash_contents=False):
+    # With incremental, a manifest in the output folder records what earlier runs wrote:
+    # only new or changed image/label pairs are processed and the outputs of deleted
+    # inputs are removed (see IncrementalManifest).
+    # image_folder may also be a packed dataset or a split of one (see shards.py);
+    # its labels are used and label_folder is ignored.
+    shards = open_shards(image_folder) if is_shard_path(image_folder) else None
+    if shards is not None and incremental:
+        shards.close()
+        raise ValueError("Incremental runs need an image folder, not a packed dataset")
+    # Create the output folder if it doesn't exist
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    # Each selected transform becomes one output variant with its own prefix
+    variants = resolve_variants(transforms, prefix)
+
+    # Parse every label file once into a single array and transform all boxes
+    # of the dataset for every variant in one operation each
+    if shards is not None:
+        label_index = shards.labels
+        filenames = list(shards.filenames)
+    else:
+        with metrics.timer('flip.load_labels'):
+            label_index = load_labels(label_folder)
+        report_label_errors(label_index)
+        filenames = [f for f in os.listdir(image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    variant_indexes = [label_index.with_boxes(transform_boxes(label_index.boxes, name)) for name, _ in variants]
+
+    manifest = None
+    if incremental:
+        params = {'tool': 'flip', 'images': os.path.abspath(image_folder), 'labels': os.path.abspath(label_folder),
+                  'variants': variants, 'image_format': image_format, 'quality': quality}
+        manifest = IncrementalManifest(output_folder, params, hash_contents=hash_contents)
+        label_files = list_label_files(label_folder)
+        inputs = {}
+        for filename in filenames:
+            label_file = label_files.get(os.path.splitext(filename)[0])
+            inputs[filename] = (os.path.join(image_folder, filename), label_file.path if label_file else None)
+        filenames = manifest.plan(inputs)
+        metrics.count('flip.unchanged', len(inputs) - len(filenames))
+        metrics.count('flip.removed', len(manifest.removed))
+        print(f"{len(filenames)} new or changed image(s), {len(inputs) - len(filenames)} unchanged, "
+              f"{len(manifest.removed)} removed")
+    else:
+        discard_manifest(output_folder)
+
+    def outputs(filename, image):
+        # Encoded image and label text of every variant of one decoded image
+        annotation_name = os.path.splitext(filename)[0]
+        output_image_filename = output_filename(filename, image_format)
+        extension = os.path.splitext(output_image_filename)[1]
+        params = encode_params(extension, quality)
+        for (name, variant_prefix), variant_index in zip(variants, variant_indexes):
+            # Transform and encode the image
+            with metrics.timer('flip.transform'):
+                transformed = transform_image(image, name)
+            with metrics.timer('flip.encode'):
+                encoded = encode_image(transformed, extension, params)
+            output_image_path = os.path.join(output_folder, variant_prefix + output_image_filename)
+            metrics.count('flip.images')
+            yield output_image_path, encoded
+
+            # Transformed annotation file if the source has one
+            if annotation_name in label_index:
+                transformed_annotations = ''.join(format_labels(variant_index.get(annotation_name)))
+                output_annotation_path = os.path.join(output_folder, variant_prefix + annotation_name + '.txt')
+                metrics.count('flip.labels')
+                yield output_annotation_path, transformed_annotations
+
+    done = manifest.record if manifest is not None else None
+    try:
+        with metrics.session():
+            if workers > 1:
+                _run_flip_pipeline(image_folder, filenames, outputs, workers, queue_size or workers * 4, done,
+                                   shards)
+                return
+
+            for filename in filenames:
+                image_path = os.path.join(image_folder, filename)
+                # Read the image once for all variants
+                with metrics.timer('flip.decode'):
+                    if shards is not None:
+                        image = shards.decode(shards.index_of(filename))
+                    else:
+                        image = cv2.imread(image_path)
+                if image is None:
+                    print(f"Could not read image: {image_path}")
+                    continue
+                written = []
+                for path, data in outputs(filename, image):
+                    with metrics.timer('flip.write'):
+                        write_file(path, data)
+                    written.append(path)
+                if done is not None:
+                    done(filename, written)
+    finally:
+        if manifest is not None:
+            manifest.close()
+        if shards is not None:
+            shards.close()
+
+def _run_flip_pipeline(image_folder, filenames, outputs, workers, queue_size, done=None, shards=None):
+    # reader thread -> `workers` decode/transform/encode threads -> writer thread,
+    # connected by bounded queues so disk reads, CPU work and disk writes overlap
+    # while at most `queue_size` items wait between two stages. done(filename, paths)
+    # is called by the writer once all outputs of an image are on disk. With shards the
+    # images come from the packed dataset instead of image_folder.
+    read_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    errors = []
+
+    def reader():
+        try:
+            for filename in filenames:
+                image_path = os.path.join(image_folder, filename)
+                try:
+                    # Raw file bytes; decoding happens in the worker pool
+                    with metrics.timer('flip.read'):
+                        if shards is not None:
+                            data = shards.read(shards.index_of(filename))
+                        else:
+                            data = np.fromfile(image_path, dtype=np.uint8)
+                except OSError:
+                    print(f"Could not read image: {image_path}")
+                    continue
+                read_queue.put((filename, image_path, data))
+        finally:
+            for _ in range(workers):
+                read_queue.put(None)
+
+    def worker():
+        while True:
+            item = read_queue.get()
+            if item is None:
+                return
+            filename, image_path, data = item
+            try:
+                with metrics.timer('flip.decode'):
+                    image = cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+                if image is None:
+                    print(f"Could not read image: {image_path}")
+                    continue
+                written = []
+                for output in outputs(filename, image):
+                    write_queue.put(output)
+                    written.append(output[0])
+                if done is not None:
+                    # The single writer sees this marker after the image's outputs
+                    write_queue.put((None, (filename, written)))
+            except Exception as error:
+                errors.append(error)
+
+    def writer():
+        while True:
+            item = write_queue.get()
+            if item is None:
+                return
+            path, data = item
+            try:
+                if path is None:
+                    # Nothing is recorded after a failure, the next run retries
+                    if not errors:
+                        done(*data)
+                    continue
+                with metrics.timer('flip.write'):
+                    write_file(path, data)
+            except Exception as error:
+                errors.append(error)
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    worker_threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    for thread in [reader_thread, writer_thread, *worker_threads]:
+        thread.start()
+    reader_thread.join()
+    for thread in worker_threads:
+        thread.join()
+    write_queue.put(None)
+    writer_thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+# Kept in the output folder it describes
+MANIFEST_FILENAME = '.dataset_tools_manifest.sqlite'
+# Bump when the manifest layout changes so old manifests are rebuilt
+MANIFEST_VERSION = 1
+# Records written per transaction
+COMMIT_EVERY = 1000
+
+def fingerprint(paths):
+    # 'size:mtime_ns' of every input file of an entry, '-' for a missing one
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path) if path is not None else None
+        except FileNotFoundError:
+            stat = None
+        parts.append(f"{stat.st_size}:{stat.st_mtime_ns}" if stat is not None else '-')
+    return ' '.join(parts)
+
+def content_digest(paths, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        digest.update(b'\0')
+        if path is None or not os.path.exists(path):
+            continue
+        with open(path, 'rb') as input_file:
+            for chunk in iter(lambda: input_file.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def discard_manifest(output_folder):
+    # A full (non-incremental) run may overwrite what the manifest describes
+    try:
+        os.remove(os.path.join(output_folder, MANIFEST_FILENAME))
+    except FileNotFoundError:
+        pass
+
+class IncrementalManifest:
+    # Per-output-folder record of which inputs a tool has processed and what it wrote
+    # for them, so a rerun only processes new or changed inputs and deletes the outputs
+    # of inputs that disappeared. An entry (e.g. one image) is keyed by name and
+    # fingerprinted by the size and mtime of its input files (e.g. image and label);
+    # with hash_contents an entry whose files were touched but not modified is still
+    # skipped. A change of `params` (the tool's settings) invalidates every entry.
+    #
+    #   manifest = IncrementalManifest(output_folder, params)
+    #   for key in manifest.plan({name: (image_path, label_path), ...}):
+    #       ... write outputs ...
+    #       manifest.record(key, output_paths)
+    #   manifest.close()
+    def __init__(self, output_folder, params, hash_contents=False):
+        self.output_folder = output_folder
+        self.hash_contents = hash_contents
+        self.path = os.path.join(output_folder, MANIFEST_FILENAME)
+        self.lock = threading.Lock()
+        self.removed = []
+        self._pending = {}
+        self._uncommitted = 0
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, stat TEXT, digest TEXT, outputs TEXT);")
+        params = json.dumps({'version': MANIFEST_VERSION, **params}, sort_keys=True)
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        if row is None or row[0] != params:
+            # Keep the recorded outputs so they can still be cleaned up, but forget
+            # the fingerprints: every entry is processed again with the new settings
+            with self.connection:
+                self.connection.execute("UPDATE entries SET stat = NULL, digest = NULL")
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('params', ?)", (params,))
+
+    def plan(self, inputs):
+        # inputs: {key: (input paths, None for an optional missing file)}.
+        # Deletes the outputs of recorded keys missing from `inputs` and returns the
+        # keys that need processing, in the order of `inputs`.
+        recorded = {key: (stat, digest, outputs) for key, stat, digest, outputs
+                    in self.connection.execute("SELECT key, stat, digest, outputs FROM entries")}
+        changed = []
+        refreshed = []
+        for key, paths in inputs.items():
+            stat = fingerprint(paths)
+            previous = recorded.get(key)
+            digest = None
+            if previous is not None:
+                if previous[0] == stat:
+                    continue
+                if self.hash_contents and previous[1] is not None:
+                    digest = content_digest(paths)
+                    if digest == previous[1]:
+                        refreshed.append((stat, key))
+                        continue
+            self._pending[key] = (paths, stat, digest, json.loads(previous[2]) if previous is not None else [])
+            changed.append(key)
+
+        self.removed = [key for key in recorded if key not in inputs]
+        with self.connection:
+            self.connection.executemany("UPDATE entries SET stat = ? WHERE key = ?", refreshed)
+            for key in self.removed:
+                self._remove_outputs(json.loads(recorded[key][2]))
+            self.connection.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in self.removed])
+        return changed
+
+    def record(self, key, outputs):
+        # Call once every output of a planned key is written; outputs it produced in
+        # an earlier run but not this time are deleted
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        paths, stat, digest, previous_outputs = pending
+        if self.hash_contents and digest is None:
+            digest = content_digest(paths)
+        outputs = sorted({os.path.relpath(path, self.output_folder) for path in outputs})
+        self._remove_outputs(set(previous_outputs) - set(outputs))
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                                    (key, stat, digest, json.dumps(outputs)))
+            self._uncommitted += 1
+            if self._uncommitted >= COMMIT_EVERY:
+                self.connection.commit()
+                self._uncommitted = 0
+
+    def close(self):
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
+
+    def _remove_outputs(self, outputs):
+        for output in outputs:
+            try:
+                os.remove(os.path.join(self.output_folder, output))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,203 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+LABEL_EXTENSION = '.txt'
+# Bump when the cache layout changes so stale caches are rebuilt
+CACHE_VERSION = 2
+
+class LabelIndex:
+    # All YOLO labels of a folder in one contiguous array:
+    #   boxes   (N, 5) float32 rows of class_id center_x center_y width height
+    #   offsets (M + 1,) int64, boxes of names[i] are boxes[offsets[i]:offsets[i + 1]]
+    #   errors  list of (path, line_number, line) for lines that could not be parsed
+    def __init__(self, names, boxes, offsets, errors=None):
+        self.names = list(names)
+        self.boxes = boxes
+        self.offsets = offsets
+        self.errors = errors or []
+        self._positions = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def get(self, name):
+        # Boxes for a label stem (filename without .txt); empty (0, 5) array if missing
+        i = self._positions.get(name)
+        if i is None:
+            return np.zeros((0, 5), dtype=np.float32)
+        return self.boxes[self.offsets[i]:self.offsets[i + 1]]
+
+    def positions(self, names):
+        # Row in names for each requested stem, -1 where there is no label file
+        return np.array([self._positions.get(name, -1) for name in names], dtype=np.int64)
+
+    def with_boxes(self, boxes):
+        # Same files and offsets over a transformed (N, 5) array, e.g. flipped boxes
+        index = LabelIndex.__new__(LabelIndex)
+        index.names = self.names
+        index.boxes = boxes
+        index.offsets = self.offsets
+        index.errors = self.errors
+        index._positions = self._positions
+        return index
+
+    def image_ids(self):
+        # Row index into names for every box
+        return np.repeat(np.arange(len(self.names)), np.diff(self.offsets))
+
+    def num_classes(self):
+        if len(self.boxes) == 0:
+            return 0
+        return int(self.boxes[:, 0].max()) + 1
+
+    def class_counts(self, num_classes=None):
+        num_classes = num_classes or self.num_classes()
+        return np.bincount(self.boxes[:, 0].astype(np.int64), minlength=num_classes)
+
+    def class_histogram(self, num_classes=None):
+        # (M, num_classes) int32 matrix with the number of boxes per class for every label file
+        num_classes = num_classes or self.num_classes()
+        histogram = np.zeros((len(self.names), num_classes), dtype=np.int32)
+        if len(self.boxes):
+            np.add.at(histogram, (self.image_ids(), self.boxes[:, 0].astype(np.int64)), 1)
+        return histogram
+
+def parse_label_text(text, path=None):
+    # Returns (boxes, errors). Malformed lines are reported in errors instead of raising.
+    lines = text.splitlines()
+    rows = [parts for parts in (line.split() for line in lines) if parts]
+    # Fast path: every non-empty line has exactly five numbers, parse them in one go.
+    # The count is checked per line: a 4-field line next to a 6-field one adds up to 10 too.
+    if all(len(parts) == 5 for parts in rows):
+        try:
+            return np.array(rows, dtype=np.float32).reshape(-1, 5), []
+        except ValueError:
+            pass
+
+    boxes = []
+    errors = []
+    for line_number, line in enumerate(lines, start=1):
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) != 5:
+            errors.append((path, line_number, line))
+            continue
+        try:
+            boxes.append([float(value) for value in parts])
+        except ValueError:
+            errors.append((path, line_number, line))
+    return np.array(boxes, dtype=np.float32).reshape(-1, 5), errors
+
+def read_label_file(path):
+    with open(path, 'r') as file:
+        return parse_label_text(file.read(), path)
+
+def format_labels(boxes):
+    # Inverse of parse_label_text, one YOLO line per box
+    return [f"{int(class_id)} {center_x:.6f} {center_y:.6f} {box_width:.6f} {box_height:.6f}\n"
+            for class_id, center_x, center_y, box_width, box_height in boxes.tolist()]
+
+def boxes_to_pixels(boxes, width, height):
+    # Normalized center/size boxes to absolute (x1, y1, x2, y2) pixel corners
+    centers = boxes[:, 1:3]
+    half_sizes = boxes[:, 3:5] / 2
+    corners = np.concatenate([centers - half_sizes, centers + half_sizes], axis=1)
+    return (corners * np.array([width, height, width, height], dtype=np.float32)).astype(np.int32)
+
+def list_label_files(label_folder):
+    # {stem: DirEntry} for every .txt in the folder, one directory scan instead of a stat per image
+    labels = {}
+    if not os.path.isdir(label_folder):
+        return labels
+    with os.scandir(label_folder) as entries:
+        for entry in entries:
+            if entry.name.endswith(LABEL_EXTENSION) and entry.is_file():
+                labels[entry.name[:-len(LABEL_EXTENSION)]] = entry
+    return labels
+
+def load_labels(label_folder, cache_path=None, workers=None):
+    # Bulk-load every label file of a folder into a LabelIndex. With cache_path the
+    # parsed arrays are persisted to <cache_path>.npz/.npy and reused while the
+    # label files' names, sizes and mtimes are unchanged.
+    entries = list_label_files(label_folder)
+    names = sorted(entries)
+    stats = [entries[name].stat() for name in names]
+    mtimes = np.array([stat.st_mtime_ns for stat in stats], dtype=np.int64)
+    sizes = np.array([stat.st_size for stat in stats], dtype=np.int64)
+
+    if cache_path is not None:
+        index = _load_cache(cache_path, names, mtimes, sizes)
+        if index is not None:
+            return index
+
+    paths = [entries[name].path for name in names]
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    if workers > 1 and len(paths) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(read_label_file, paths, chunksize=256))
+    else:
+        parsed = [read_label_file(path) for path in paths]
+
+    counts = np.array([len(boxes) for boxes, _ in parsed], dtype=np.int64)
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    if parsed:
+        boxes = np.concatenate([boxes for boxes, _ in parsed])
+    else:
+        boxes = np.zeros((0, 5), dtype=np.float32)
+    errors = [error for _, file_errors in parsed for error in file_errors]
+    index = LabelIndex(names, boxes, offsets, errors)
+
+    if cache_path is not None:
+        _save_cache(cache_path, index, mtimes, sizes)
+    return index
+
+def report_label_errors(index, limit=10):
+    if not index.errors:
+        return
+    print(f"Skipped {len(index.errors)} malformed label line(s):")
+    for path, line_number, line in index.errors[:limit]:
+        print(f"  {path}:{line_number}: {line.strip()!r}")
+    if len(index.errors) > limit:
+        print(f"  ... and {len(index.errors) - limit} more")
+
+def _save_cache(cache_path, index, mtimes, sizes):
+    # Boxes go to a plain .npy so they can be memory-mapped on load
+    np.save(cache_path + '.npy', index.boxes)
+    error_paths, error_lines, error_texts = zip(*index.errors) if index.errors else ((), (), ())
+    np.savez(cache_path + '.npz',
+             version=np.array(CACHE_VERSION),
+             names=np.array(index.names, dtype=str),
+             mtimes=mtimes,
+             sizes=sizes,
+             offsets=index.offsets,
+             error_paths=np.array(error_paths, dtype=str),
+             error_lines=np.array(error_lines, dtype=np.int64),
+             error_texts=np.array(error_texts, dtype=str))
+
+def _load_cache(cache_path, names, mtimes, sizes):
+    if not (os.path.exists(cache_path + '.npz') and os.path.exists(cache_path + '.npy')):
+        return None
+    try:
+        with np.load(cache_path + '.npz') as meta:
+            if int(meta['version']) != CACHE_VERSION:
+                return None
+            if meta['names'].tolist() != names:
+                return None
+            if not (np.array_equal(meta['mtimes'], mtimes) and np.array_equal(meta['sizes'], sizes)):
+                return None
+            offsets = meta['offsets']
+            errors = list(zip(meta['error_paths'].tolist(), meta['error_lines'].tolist(),
+                              meta['error_texts'].tolist()))
+        boxes = np.load(cache_path + '.npy', mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None
+    if len(boxes) != offsets[-1]:
+        return None
+    return LabelIndex(names, boxes, offsets, errors)
@@ -0,0 +1,266 @@
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+
+# Upper bounds (seconds) of the latency histogram buckets, Prometheus style
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Seconds between two periodic summaries
+SUMMARY_INTERVAL = 10.0
+
+_NULL_TIMER = contextlib.nullcontext()
+
+class Histogram:
+    # Count, sum and cumulative-ready bucket counts of observed durations
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'mean': self.mean(), 'max': self.max,
+                'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], self.counts))}
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+class Metrics:
+    # Process-wide counters, gauges and per-stage latency histograms.
+    # Names are dotted, tool first: 'annotate.images', 'flip.encode'. When disabled every
+    # call returns right away (timer() hands out a shared no-op context manager), so
+    # instrumented code pays one attribute check per call.
+    def __init__(self):
+        self.enabled = True
+        self.interval = SUMMARY_INTERVAL
+        self.json_path = None
+        self.prometheus_path = None
+        self.lock = threading.Lock()
+        self.reset()
+        self._sessions = 0
+        self._stop = None
+        self._thread = None
+
+    def configure(self, enabled=None, interval=None, json_path=None, prometheus_path=None):
+        if enabled is not None:
+            self.enabled = enabled
+        if interval is not None:
+            self.interval = interval
+        if json_path is not None:
+            self.json_path = json_path
+        if prometheus_path is not None:
+            self.prometheus_path = prometheus_path
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+            self.started = time.monotonic()
+            self._last_summary = (self.started, {})
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def merge_histograms(self, histograms):
+        # Add the snapshot()['histograms'] of another process (e.g. a worker) to this registry
+        if not self.enabled:
+            return
+        with self.lock:
+            for name, other in histograms.items():
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram()
+                counts = list(other['buckets'].values())
+                if len(counts) != len(histogram.counts):
+                    continue
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.count += other['count']
+                histogram.sum += other['sum']
+                histogram.max = max(histogram.max, other['max'])
+
+    def timer(self, name):
+        # with metrics.timer('annotate.decode'): image = cv2.imread(path)
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'elapsed': time.monotonic() - self.started,
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                           for (name, labels), value in sorted(self.gauges.items())],
+                'histograms': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+            }
+
+    def summary(self):
+        # One line: every counter with its rate since the previous summary, and the
+        # mean time of every stage
+        now = time.monotonic()
+        with self.lock:
+            last_time, last_counters = self._last_summary
+            counters = dict(self.counters)
+            self._last_summary = (now, counters)
+            histograms = [(name, histogram.mean(), histogram.count) for name, histogram in sorted(self.histograms.items())]
+            gauges = sorted(self.gauges.items())
+        elapsed = max(now - last_time, 1e-9)
+        parts = []
+        for key, value in sorted(counters.items()):
+            rate = (value - last_counters.get(key, 0)) / elapsed
+            parts.append(f"{_format_key(key)} {value:g} ({rate:.1f}/s)")
+        for key, value in gauges:
+            parts.append(f"{_format_key(key)} {value:.4g}" if isinstance(value, float) else f"{_format_key(key)} {value}")
+        for name, mean, count in histograms:
+            parts.append(f"{name} {mean * 1000:.2f} ms x{count}")
+        return f"[{now - self.started:.0f}s] " + " | ".join(parts) if parts else ""
+
+    def export_json(self, path):
+        _atomic_write(path, json.dumps(self.snapshot(), indent=2))
+
+    def export_prometheus(self, path):
+        # Text exposition format, e.g. for the node_exporter textfile collector
+        snapshot = self.snapshot()
+        lines = []
+        for kind, entries in (('counter', snapshot['counters']), ('gauge', snapshot['gauges'])):
+            declared = set()
+            for entry in entries:
+                metric = _prometheus_name(entry['name']) + ('_total' if kind == 'counter' else '')
+                if metric not in declared:
+                    lines.append(f"# TYPE {metric} {kind}")
+                    declared.add(metric)
+                lines.append(f"{metric}{_prometheus_labels(entry['labels'])} {entry['value']}")
+        for name, histogram in snapshot['histograms'].items():
+            metric = _prometheus_name(name) + '_seconds'
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in histogram['buckets'].items():
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum {histogram['sum']}")
+            lines.append(f"{metric}_count {histogram['count']}")
+        _atomic_write(path, "\n".join(lines) + "\n")
+
+    def export(self):
+        if self.json_path:
+            self.export_json(self.json_path)
+        if self.prometheus_path:
+            self.export_prometheus(self.prometheus_path)
+
+    def _report(self):
+        while not self._stop.wait(self.interval):
+            line = self.summary()
+            if line:
+                print(line)
+            self.export()
+
+    @contextlib.contextmanager
+    def session(self):
+        # Around a tool run: prints a summary every `interval` seconds (instead of a
+        # line per file) and once at the end, writes the configured exports and resets.
+        # Nested sessions (a pipeline calling other tools) share the outermost one.
+        if not self.enabled:
+            yield self
+            return
+        with self.lock:
+            self._sessions += 1
+            outermost = self._sessions == 1
+        if outermost:
+            # Metrics recorded just before the session (e.g. label loading) belong to it;
+            # everything is cleared once the session has been reported
+            with self.lock:
+                self.started = time.monotonic()
+                self._last_summary = (self.started, {})
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._report, daemon=True)
+            self._thread.start()
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self._sessions -= 1
+            if outermost:
+                self._stop.set()
+                self._thread.join()
+                line = self.summary()
+                if line:
+                    print(line)
+                self.export()
+                self.reset()
+
+def _format_key(key):
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{label}={value}" for label, value in labels) + "}"
+
+def _prometheus_name(name):
+    return 'dataset_tools_' + ''.join(c if c.isalnum() else '_' for c in name)
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return "{" + ",".join(f'{label}="{value}"' for label, value in zip(labels, escaped)) + "}"
+
+def _atomic_write(path, text):
+    # Scrapers must never see a half-written file
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w') as output:
+        output.write(text)
+    os.replace(temporary, path)
+
+# The registry every tool reports to
+metrics = Metrics()
@@ -0,0 +1,179 @@
+import os
+import queue
+import random
+import threading
+
+import cv2
+
+from .augment import resolve_variants, transform_boxes, transform_image
+from .dedup import FrameDeduplicator
+from .encoding import encode_image, encode_params, image_extension, write_file
+from .extraction import SEEK_THRESHOLD, find_videos, iter_frames, video_names
+from .labels import format_labels, load_labels, report_label_errors
+from .metrics import metrics
+
+def split_assigner(split_names, ratios, seed=None, key=''):
+    # Endless generator of split names for a stream of source frames whose count is not
+    # known in advance. Each frame goes to a random split, weighted by how far every
+    # split is behind its share so far, so the ratios hold to within a frame at any
+    # point. Reproducible for the same seed and key (e.g. the video name), whatever
+    # else runs concurrently.
+    rng = random.Random(f"{seed}:{key}") if seed is not None else random.Random()
+    assigned = [0] * len(split_names)
+    total = 0
+    while True:
+        total += 1
+        deficits = [max(ratio * total - count, 0) for ratio, count in zip(ratios, assigned)]
+        index = rng.choices(range(len(split_names)), weights=deficits)[0]
+        assigned[index] += 1
+        yield split_names[index]
+
+def build_dataset(inputs, output_folder, labels_folder=None, frame_interval=30, every_seconds=None,
+                  target_width=640, target_height=640, transforms=('hflip',), keep_original=True, prefix='fl_',
+                  train_ratio=0.8, test_ratio=0.0, seed=None, image_format='jpg', quality=None,
+                  dedup_method=None, decode_workers=1, transform_workers=None, write_workers=1, queue_size=None):
+    # vid2images -> flip -> splitDataset in one pass: frames are decoded from the videos,
+    # resized, assigned to a split, transformed and encoded once, and written straight
+    # to output_folder/images|labels/<split>/ without intermediate files.
+    #   decode_workers     videos decoded concurrently
+    #   transform_workers  threads transforming and encoding frames (default: CPU count)
+    #   write_workers      threads writing the encoded files
+    # Stages are connected by bounded queues holding at most queue_size items each.
+    # With labels_folder, labels named like the extracted frames (<video>_frame_0000.txt)
+    # are transformed along with their frame; all variants of a frame share its split.
+    # Returns {split: number of written images}.
+    if train_ratio < 0 or test_ratio < 0 or train_ratio + test_ratio > 1:
+        raise ValueError("train_ratio and test_ratio must be non-negative and add up to at most 1")
+    videos = find_videos(inputs)
+    if not videos:
+        raise ValueError("No video files found")
+    # Frames are named after their video; videos sharing a file name get distinct names
+    names = video_names(videos)
+    split_names = ["train", "val", "test"] if test_ratio > 0 else ["train", "val"]
+    ratios = [train_ratio, 1 - train_ratio - test_ratio, test_ratio][:len(split_names)]
+    variants = ([(None, '')] if keep_original else []) + resolve_variants(transforms, prefix)
+    if not variants:
+        raise ValueError("Nothing to write: keep the original frames or select a transform")
+    extension = image_extension(image_format)
+    params = encode_params(extension, quality)
+
+    label_index = None
+    if labels_folder:
+        label_index = load_labels(labels_folder)
+        report_label_errors(label_index)
+
+    for kind in ("images", "labels"):
+        for split in split_names:
+            os.makedirs(os.path.join(output_folder, kind, split), exist_ok=True)
+
+    transform_workers = max(1, transform_workers or os.cpu_count() or 1)
+    decode_workers = max(1, min(decode_workers, len(videos)))
+    write_workers = max(1, write_workers)
+    queue_size = queue_size or transform_workers * 4
+    video_queue = queue.Queue()
+    frame_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    for video_path in videos:
+        video_queue.put(video_path)
+    counts = {split: 0 for split in split_names}
+    counts_lock = threading.Lock()
+    errors = []
+
+    def decode(video_path):
+        video_name = names[video_path]
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video: {video_path}")
+        deduplicator = FrameDeduplicator(dedup_method) if dedup_method else None
+        splits = split_assigner(split_names, ratios, seed, key=video_name)
+        image_count = 0
+        frames = iter_frames(cap, frame_interval, every_seconds, SEEK_THRESHOLD)
+        try:
+            while True:
+                with metrics.timer('build.decode'):
+                    item = next(frames, None)
+                if item is None:
+                    break
+                _, frame = item
+                if deduplicator is not None and not deduplicator.should_keep(frame):
+                    metrics.count('build.duplicates')
+                    continue
+                if target_width > 0 and target_height > 0:
+                    if frame.shape[1] != target_width or frame.shape[0] != target_height:
+                        with metrics.timer('build.resize'):
+                            frame = cv2.resize(frame, (target_width, target_height), interpolation=cv2.INTER_AREA)
+                frame_queue.put((f'{video_name}_frame_{image_count:04d}', next(splits), frame))
+                metrics.count('build.frames')
+                image_count += 1
+        finally:
+            cap.release()
+        print(f'Finished {video_path}: {image_count} frames')
+
+    def decoder():
+        while True:
+            try:
+                video_path = video_queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                decode(video_path)
+            except Exception as error:
+                print(f'Failed {video_path}: {error}')
+                errors.append(error)
+
+    def transformer():
+        while True:
+            item = frame_queue.get()
+            if item is None:
+                return
+            name, split, frame = item
+            try:
+                boxes = label_index.get(name) if label_index is not None and name in label_index else None
+                for transform, variant_prefix in variants:
+                    with metrics.timer('build.transform'):
+                        image = frame if transform is None else transform_image(frame, transform)
+                    with metrics.timer('build.encode'):
+                        encoded = encode_image(image, extension, params)
+                    image_path = os.path.join(output_folder, "images", split, variant_prefix + name + extension)
+                    write_queue.put((image_path, encoded))
+                    metrics.count('build.images', split=split)
+                    if boxes is not None:
+                        variant_boxes = boxes if transform is None else transform_boxes(boxes, transform)
+                        label_path = os.path.join(output_folder, "labels", split, variant_prefix + name + '.txt')
+                        write_queue.put((label_path, ''.join(format_labels(variant_boxes))))
+                with counts_lock:
+                    counts[split] += len(variants)
+            except Exception as error:
+                errors.append(error)
+
+    def writer():
+        while True:
+            item = write_queue.get()
+            if item is None:
+                return
+            path, data = item
+            try:
+                with metrics.timer('build.write'):
+                    write_file(path, data)
+            except Exception as error:
+                errors.append(error)
+
+    decoder_threads = [threading.Thread(target=decoder, daemon=True) for _ in range(decode_workers)]
+    transformer_threads = [threading.Thread(target=transformer, daemon=True) for _ in range(transform_workers)]
+    writer_threads = [threading.Thread(target=writer, daemon=True) for _ in range(write_workers)]
+    with metrics.session():
+        for thread in [*writer_threads, *transformer_threads, *decoder_threads]:
+            thread.start()
+        for thread in decoder_threads:
+            thread.join()
+        for _ in transformer_threads:
+            frame_queue.put(None)
+        for thread in transformer_threads:
+            thread.join()
+        for _ in writer_threads:
+            write_queue.put(None)
+        for thread in writer_threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return counts
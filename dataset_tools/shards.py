@@ -0,0 +1,217 @@
+import io
+import mmap
+import os
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .encoding import write_file
+from .labels import LabelIndex, format_labels, load_labels, report_label_errors
+from .metrics import metrics
+
+# A packed dataset is a folder of WebDataset-style tar shards (every sample is a
+# <name>.<ext> image member followed by a <name>.txt label member) plus:
+#   index.npz   names, image extension, shard number, data offset and size of every
+#               image inside its tar, and the label offsets
+#   labels.npy  (N, 5) float32 boxes of all labels, memory-mapped on load
+# Readers take the images straight out of the memory-mapped tars through the index,
+# so opening a million-sample dataset costs a few file opens instead of a listing
+# and a stat per sample. Plain tar tools (and WebDataset) can still read the shards.
+SHARD_INDEX = 'index.npz'
+SHARD_LABELS = 'labels.npy'
+SHARD_PATTERN = 'shard-{:06d}.tar'
+# Bump when the index layout changes
+SHARD_VERSION = 1
+# Size at which a shard is closed and the next one started
+DEFAULT_SHARD_BYTES = 512 * 1024 * 1024
+# A split of a packed dataset is an index file over its samples: <split>.index.npz
+SPLIT_INDEX_SUFFIX = '.index.npz'
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp', '.tif', '.tiff')
+
+def is_shard_path(path):
+    # A packed dataset folder or a split index over one
+    return os.path.isfile(os.path.join(path, SHARD_INDEX)) or (path.endswith(SPLIT_INDEX_SUFFIX) and os.path.isfile(path))
+
+def open_shards(path):
+    if path.endswith(SPLIT_INDEX_SUFFIX):
+        with np.load(path) as split:
+            return ShardDataset(str(split['shards']), positions=split['positions'])
+    return ShardDataset(path)
+
+def write_split_index(path, shard_folder, positions):
+    np.savez(path, shards=np.array(os.path.abspath(shard_folder)), positions=np.asarray(positions, dtype=np.int64))
+
+class ShardDataset:
+    # Read access to a packed dataset, optionally restricted to the samples at
+    # `positions` (e.g. one split). Images are returned as encoded bytes viewing
+    # the memory-mapped shard, so nothing is read until they are decoded.
+    def __init__(self, folder, positions=None):
+        self.folder = folder
+        with np.load(os.path.join(folder, SHARD_INDEX)) as index:
+            if int(index['version']) != SHARD_VERSION:
+                raise ValueError(f"Unsupported shard index version in {folder}, repack the dataset")
+            names = index['names']
+            extensions = index['extensions']
+            self.shard_ids = index['shards']
+            self.offsets = index['offsets']
+            self.sizes = index['sizes']
+            label_names = index['label_names'].tolist()
+            label_offsets = index['label_offsets']
+            num_shards = int(index['num_shards'])
+        # Every label, also those of samples outside `positions`
+        self.labels = LabelIndex(label_names, np.load(os.path.join(folder, SHARD_LABELS), mmap_mode='r'),
+                                 label_offsets)
+        self.positions = np.arange(len(names)) if positions is None else np.asarray(positions, dtype=np.int64)
+        self.names = names[self.positions].tolist()
+        self.filenames = [name + extension for name, extension in zip(self.names, extensions[self.positions].tolist())]
+        self._lookup = None
+        self._maps = []
+        for shard in range(num_shards):
+            with open(os.path.join(folder, SHARD_PATTERN.format(shard)), 'rb') as shard_file:
+                self._maps.append(mmap.mmap(shard_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def index_of(self, filename):
+        # Position in this dataset of an image filename
+        if self._lookup is None:
+            self._lookup = {filename: i for i, filename in enumerate(self.filenames)}
+        return self._lookup[filename]
+
+    def read(self, i):
+        # Encoded image bytes of sample i as a uint8 array, ready for cv2.imdecode
+        sample = self.positions[i]
+        return np.frombuffer(self._maps[self.shard_ids[sample]], dtype=np.uint8,
+                             count=int(self.sizes[sample]), offset=int(self.offsets[sample]))
+
+    def decode(self, i, flags=cv2.IMREAD_COLOR):
+        return cv2.imdecode(self.read(i), flags)
+
+    def close(self):
+        for shard_map in self._maps:
+            try:
+                shard_map.close()
+            except BufferError:
+                # Arrays returned by read() still view it; it is unmapped once they are gone
+                pass
+        self._maps = []
+
+def _read_ahead(paths, workers, window):
+    # File contents in order, read by `workers` threads with at most `window` files in memory
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for path in paths:
+            pending.append(executor.submit(_read_bytes, path))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _read_bytes(path):
+    with metrics.timer('pack.read'):
+        with open(path, 'rb') as input_file:
+            return input_file.read()
+
+def _add_member(tar, name, data, mtime):
+    # Returns the offset of the member's data in the tar file
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    tar.addfile(info, io.BytesIO(data))
+    # Member data is the last thing written, padded to whole 512-byte blocks
+    return tar.offset - -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+
+def pack_dataset(image_folder, label_folder, output_folder, shard_bytes=DEFAULT_SHARD_BYTES, workers=8):
+    # Pack an image folder and its YOLO labels into tar shards of about shard_bytes
+    # each (see the layout above). Images are stored as they are, without re-encoding;
+    # labels are stored as parsed (malformed lines are reported and dropped).
+    # Returns the number of packed samples.
+    with os.scandir(image_folder) as entries:
+        filenames = sorted(entry.name for entry in entries
+                           if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file())
+    if not filenames:
+        raise ValueError(f"No image files found in the images folder: {image_folder}")
+    names = [os.path.splitext(filename)[0] for filename in filenames]
+    if len(set(names)) != len(names):
+        raise ValueError("Image names must be unique without their extension to pair them with labels")
+    with metrics.timer('pack.load_labels'):
+        label_index = load_labels(label_folder)
+    report_label_errors(label_index)
+
+    os.makedirs(output_folder, exist_ok=True)
+    shard_ids = np.zeros(len(filenames), dtype=np.int32)
+    offsets = np.zeros(len(filenames), dtype=np.int64)
+    sizes = np.zeros(len(filenames), dtype=np.int64)
+    label_names = []
+    label_boxes = []
+    shard = 0
+    tar = None
+    paths = [os.path.join(image_folder, filename) for filename in filenames]
+    # One timestamp for all members: a stat per file is what packing is meant to avoid
+    mtime = int(time.time())
+    with metrics.session():
+        try:
+            for i, data in enumerate(_read_ahead(paths, max(1, workers), max(1, workers) * 4)):
+                if tar is not None and tar.offset >= shard_bytes:
+                    tar.close()
+                    tar = None
+                    shard += 1
+                if tar is None:
+                    tar = tarfile.open(os.path.join(output_folder, SHARD_PATTERN.format(shard)), 'w',
+                                       format=tarfile.PAX_FORMAT)
+                name = names[i]
+                extension = os.path.splitext(filenames[i])[1]
+                with metrics.timer('pack.write'):
+                    offsets[i] = _add_member(tar, name + extension, data, mtime)
+                    shard_ids[i] = shard
+                    sizes[i] = len(data)
+                    if name in label_index:
+                        boxes = label_index.get(name)
+                        label_names.append(name)
+                        label_boxes.append(boxes)
+                        _add_member(tar, name + '.txt', ''.join(format_labels(boxes)).encode(), mtime)
+                metrics.count('pack.images')
+        finally:
+            if tar is not None:
+                tar.close()
+
+    label_offsets = np.zeros(len(label_names) + 1, dtype=np.int64)
+    np.cumsum([len(boxes) for boxes in label_boxes], out=label_offsets[1:])
+    boxes = np.concatenate(label_boxes) if label_boxes else np.zeros((0, 5), dtype=np.float32)
+    np.save(os.path.join(output_folder, SHARD_LABELS), boxes.astype(np.float32))
+    np.savez(os.path.join(output_folder, SHARD_INDEX),
+             version=np.array(SHARD_VERSION),
+             num_shards=np.array(shard + 1),
+             names=np.array(names, dtype=str),
+             extensions=np.array([os.path.splitext(f)[1] for f in filenames], dtype=str),
+             shards=shard_ids,
+             offsets=offsets,
+             sizes=sizes,
+             label_names=np.array(label_names, dtype=str),
+             label_offsets=label_offsets)
+    return len(filenames)
+
+def unpack_dataset(path, image_folder, label_folder):
+    # Write the samples of a packed dataset (or of a split index over one) back to
+    # an image folder and a label folder. Returns the number of samples.
+    dataset = open_shards(path)
+    os.makedirs(image_folder, exist_ok=True)
+    os.makedirs(label_folder, exist_ok=True)
+    try:
+        with metrics.session():
+            for i, (name, filename) in enumerate(zip(dataset.names, dataset.filenames)):
+                with metrics.timer('unpack.write'):
+                    write_file(os.path.join(image_folder, filename), dataset.read(i))
+                    if name in dataset.labels:
+                        write_file(os.path.join(label_folder, name + '.txt'),
+                                   ''.join(format_labels(dataset.labels.get(name))))
+                metrics.count('unpack.images')
+    finally:
+        dataset.close()
+    return len(dataset)
@@ -0,0 +1,189 @@
+import os
+import random
+import shutil
+
+import numpy as np
+
+from .labels import list_label_files, load_labels, report_label_errors
+from .metrics import metrics
+from .shards import SPLIT_INDEX_SUFFIX, is_shard_path, open_shards, write_split_index
+from .stratify import format_distribution, iterative_stratification
+
+SPLIT_MODES = ("move", "manifest", "hardlink", "symlink")
+# Every split name a run can produce, so a rerun can clear what an earlier one left
+SPLIT_NAMES = ("train", "val", "test")
+
+def yolo_label_folder(images_folder):
+    # Where YOLO looks for the labels of images listed in a manifest: the path with
+    # its last "images" component swapped for "labels" (None without one)
+    parts = os.path.abspath(images_folder).split(os.sep)
+    if "images" not in parts:
+        return None
+    parts[len(parts) - 1 - parts[::-1].index("images")] = "labels"
+    return os.sep.join(parts)
+
+def clear_previous_split(output_folder, mode):
+    # Remove what an earlier split into output_folder left behind, so samples never
+    # end up in two splits: the manifests and split indexes of every split name and,
+    # for the link modes, the images|labels/<split> link trees. Files that are not
+    # links are never deleted: in "move" mode they are the dataset itself.
+    for split in SPLIT_NAMES:
+        for filename in (f"{split}.txt", split + SPLIT_INDEX_SUFFIX):
+            path = os.path.join(output_folder, filename)
+            if os.path.isfile(path):
+                os.remove(path)
+    if mode not in ("hardlink", "symlink"):
+        return
+    folders = [os.path.join(output_folder, kind, split) for kind in ("images", "labels") for split in SPLIT_NAMES]
+    folders = [folder for folder in folders if os.path.isdir(folder)]
+    links = []
+    for folder in folders:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                # A hard link has a second name (its source) unless that was deleted
+                if entry.is_symlink() or (entry.is_file() and entry.stat().st_nlink > 1):
+                    links.append(entry.path)
+                else:
+                    raise ValueError(f"{folder} holds files that are not links of an earlier split; "
+                                     "split into an empty output folder")
+    for path in links:
+        os.remove(path)
+    for folder in folders:
+        os.rmdir(folder)
+
+def place_file(src, dest, mode):
+    # Put one file of the split into place. "move" relocates the file itself,
+    # the link modes leave the source untouched and only add a directory entry.
+    metrics.count('split.files', mode=mode)
+    with metrics.timer('split.place'):
+        if mode == "move":
+            shutil.move(src, dest)
+            return
+        if os.path.lexists(dest):
+            os.remove(dest)
+        if mode == "hardlink":
+            os.link(src, dest)
+        else:
+            os.symlink(os.path.abspath(src), dest)
+
+def split_dataset(images_folder, labels_folder, output_folder, train_ratio, mode="move", seed=None,
+                  test_ratio=0.0, stratify=False, label_workers=None):
+    # mode:
+    #   "move"     move files into output_folder/images|labels/train|val (original behaviour)
+    #   "manifest" only write output_folder/train.txt, val.txt (and test.txt) with absolute image paths;
+    #              YOLO finds each label by swapping the "images" path component for "labels"
+    #   "hardlink" / "symlink" build the images|labels/train|val tree out of links
+    # The manifest and link modes touch no pixel data and can be rerun for a new ratio in seconds.
+    # With a seed the split is reproducible. Returns {split name: image filenames}.
+    # test_ratio > 0 adds a test split; val gets whatever train and test leave over.
+    # stratify=True balances every class across the splits (iterative stratification
+    # over a per-image class histogram built in one threaded pass over the labels).
+    # images_folder may also be a packed dataset (see shards.py; labels_folder is then
+    # unused): whatever the mode, each split becomes an index file over its samples,
+    # output_folder/<split>.index.npz, which the tools read like the dataset itself.
+    if mode not in SPLIT_MODES:
+        raise ValueError(f"Unknown split mode '{mode}', expected one of: {', '.join(SPLIT_MODES)}")
+    if train_ratio < 0 or test_ratio < 0 or train_ratio + test_ratio > 1:
+        raise ValueError("train_ratio and test_ratio must be non-negative and add up to at most 1")
+
+    shards = open_shards(images_folder) if is_shard_path(images_folder) else None
+    if mode == "manifest" and shards is None:
+        label_folder = yolo_label_folder(images_folder)
+        if label_folder is None or os.path.realpath(label_folder) != os.path.realpath(labels_folder):
+            raise ValueError(f"In manifest mode YOLO reads the labels from {label_folder or 'nowhere'} "
+                             "(the image path with 'images' replaced by 'labels'), not from "
+                             f"{labels_folder}; move the labels there or use a link mode")
+
+    if shards is not None:
+        shards.close()
+        image_files = list(shards.filenames)
+    else:
+        # Get all image files (supporting multiple formats)
+        image_extensions = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tiff")
+        image_files = [f for f in os.listdir(images_folder) if f.lower().endswith(image_extensions)]
+    if not image_files:
+        raise ValueError(f"No image files found in the images folder: {images_folder}")
+    # Sorted first so the same seed always gives the same split
+    image_files.sort()
+    random.Random(seed).shuffle(image_files)
+
+    split_names = ["train", "val", "test"] if test_ratio > 0 else ["train", "val"]
+    if stratify:
+        ratios = [train_ratio, 1 - train_ratio - test_ratio, test_ratio][:len(split_names)]
+        if shards is not None:
+            label_index = shards.labels
+        else:
+            with metrics.timer('split.load_labels'):
+                label_index = load_labels(labels_folder, workers=label_workers)
+            report_label_errors(label_index)
+        histogram = label_index.class_histogram()
+        # Rows of the label histogram for every image; images without labels get an empty row
+        positions = label_index.positions([os.path.splitext(img)[0] for img in image_files])
+        if len(label_index) == 0:
+            # No label files at all: every image goes to the unlabeled fill
+            image_histogram = np.zeros((len(image_files), histogram.shape[1]), np.int32)
+        else:
+            image_histogram = np.where((positions >= 0)[:, None], histogram[np.maximum(positions, 0)], 0)
+        with metrics.timer('split.stratify'):
+            assignment = iterative_stratification(image_histogram, ratios, seed=seed)
+        splits = {name: [img for img, split in zip(image_files, assignment.tolist()) if split == i]
+                  for i, name in enumerate(split_names)}
+        print(format_distribution(split_names, assignment, image_histogram))
+    else:
+        # Calculate the number of training (and test) images
+        train_size = int(len(image_files) * train_ratio)
+        test_size = int(len(image_files) * test_ratio)
+        splits = {"train": image_files[:train_size], "val": image_files[train_size + test_size:]}
+        if test_ratio > 0:
+            splits["test"] = image_files[train_size:train_size + test_size]
+
+    os.makedirs(output_folder, exist_ok=True)
+    clear_previous_split(output_folder, mode)
+
+    if shards is not None:
+        for split, split_images in splits.items():
+            positions = shards.positions[[shards.index_of(img) for img in split_images]]
+            write_split_index(os.path.join(output_folder, split + SPLIT_INDEX_SUFFIX), shards.folder, positions)
+        return splits
+
+    if mode == "manifest":
+        for split, split_images in splits.items():
+            manifest_path = os.path.join(output_folder, f"{split}.txt")
+            with open(manifest_path, "w") as manifest:
+                manifest.writelines(os.path.abspath(os.path.join(images_folder, img)) + "\n" for img in split_images)
+        return splits
+
+    # Create the output structure:
+    # output_folder/
+    #    images/
+    #         train/
+    #         val/
+    #         test/   (only with test_ratio > 0)
+    #    labels/
+    #         train/
+    #         val/
+    #         test/
+    output_images_folder = os.path.join(output_folder, "images")
+    output_labels_folder = os.path.join(output_folder, "labels")
+    for split in splits:
+        os.makedirs(os.path.join(output_images_folder, split), exist_ok=True)
+        os.makedirs(os.path.join(output_labels_folder, split), exist_ok=True)
+
+    # One directory scan for all label files instead of an exists() call per image
+    label_files = list_label_files(labels_folder)
+
+    # Place images and corresponding labels of every split
+    for split, split_images in splits.items():
+        for img in split_images:
+            src_img = os.path.join(images_folder, img)
+            dest_img = os.path.join(output_images_folder, split, img)
+            place_file(src_img, dest_img, mode)
+
+            # Replace image extension with .txt for label filename
+            label_filename = os.path.splitext(img)[0] + ".txt"
+            if os.path.splitext(img)[0] in label_files:
+                src_label = os.path.join(labels_folder, label_filename)
+                dest_label = os.path.join(output_labels_folder, split, label_filename)
+                place_file(src_label, dest_label, mode)
+
+    return splits
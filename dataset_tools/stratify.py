@@ -0,0 +1,79 @@
+import numpy as np
+
+def allocate(total, weights):
+    # Split an integer total proportionally to weights (largest remainder method)
+    weights = np.clip(np.asarray(weights, dtype=np.float64), 0, None)
+    if weights.sum() <= 0:
+        weights = np.ones_like(weights)
+    quotas = total * weights / weights.sum()
+    counts = np.floor(quotas).astype(np.int64)
+    remainder = total - counts.sum()
+    if remainder > 0:
+        counts[np.argsort(counts - quotas, kind='stable')[:remainder]] += 1
+    return counts
+
+def iterative_stratification(histogram, ratios, seed=None):
+    # Multi-label iterative stratification (Sechidis et al., 2011) over a per-image
+    # class histogram (M, C). Returns an (M,) array with the split index of every image.
+    # Classes are handled rarest first; the images of a class are shared out among
+    # the splits in proportion to how many examples of that class each split still
+    # needs. All bookkeeping is incremental, so the cost is O(M * C) overall.
+    rng = np.random.default_rng(seed)
+    ratios = np.asarray(ratios, dtype=np.float64)
+    ratios = ratios / ratios.sum()
+    num_images, num_classes = histogram.shape
+    presence = np.ascontiguousarray((histogram > 0).T)  # (C, M), one contiguous row per class
+
+    assignment = np.full(num_images, -1, dtype=np.int64)
+    class_totals = presence.sum(axis=1).astype(np.int64)
+    desired_labels = ratios[:, None] * class_totals[None, :]
+    desired_images = ratios * num_images
+    remaining = class_totals.copy()
+
+    for _ in range(num_classes):
+        # Rarest class that still has unassigned images
+        candidates = np.flatnonzero(remaining > 0)
+        if len(candidates) == 0:
+            break
+        class_id = candidates[np.argmin(remaining[candidates])]
+
+        images = np.flatnonzero(presence[class_id] & (assignment < 0))
+        rng.shuffle(images)
+        counts = allocate(len(images), np.where(desired_labels[:, class_id] > 0,
+                                                desired_labels[:, class_id], 0))
+        # Tie-break towards splits that still need the most images
+        if counts.sum() == 0:
+            counts = allocate(len(images), desired_images)
+
+        start = 0
+        for split, count in enumerate(counts):
+            chunk = images[start:start + count]
+            start += count
+            if len(chunk) == 0:
+                continue
+            assignment[chunk] = split
+            chunk_labels = presence[:, chunk].sum(axis=1)
+            desired_labels[split] -= chunk_labels
+            desired_images[split] -= len(chunk)
+            remaining -= chunk_labels
+
+    # Images without any box fill up the splits' remaining image quotas
+    unlabeled = np.flatnonzero(assignment < 0)
+    rng.shuffle(unlabeled)
+    counts = allocate(len(unlabeled), desired_images)
+    assignment[unlabeled] = np.repeat(np.arange(len(ratios)), counts)
+    return assignment
+
+def format_distribution(split_names, assignment, histogram):
+    # Table with the number of images and boxes per class for every split
+    num_classes = histogram.shape[1]
+    totals = histogram.sum(axis=0)
+    lines = ["split".ljust(8) + "images".rjust(10) + "".join(f"{f'class {c}':>16}" for c in range(num_classes))]
+    for split, name in enumerate(split_names):
+        mask = assignment == split
+        counts = histogram[mask].sum(axis=0)
+        shares = "".join(
+            f"{f'{count} ({100 * count / total:.0f}%)' if total else '0':>16}"
+            for count, total in zip(counts.tolist(), totals.tolist()))
+        lines.append(name.ljust(8) + f"{int(mask.sum()):>10}" + shares)
+    return "\n".join(lines)
@@ -0,0 +1,548 @@
+import collections
+import datetime
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import cv2
+
+from .encoding import EncoderPool, encode_params, image_extension
+
+# Connection timeouts passed to the FFmpeg backend
+OPEN_TIMEOUT_MS = 10000
+READ_TIMEOUT_MS = 10000
+# Reconnect backoff: 1 s, 2 s, 4 s, ... capped at MAX_BACKOFF seconds
+MAX_BACKOFF = 30
+
+def open_stream(url, open_timeout_ms=OPEN_TIMEOUT_MS, read_timeout_ms=READ_TIMEOUT_MS):
+    # Open a stream with real open/read timeouts instead of polling isOpened(), which
+    # never changes after construction. Raises ConnectionError when it cannot be opened.
+    if hasattr(cv2, 'CAP_PROP_OPEN_TIMEOUT_MSEC'):
+        params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, open_timeout_ms,
+                  cv2.CAP_PROP_READ_TIMEOUT_MSEC, read_timeout_ms]
+        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+    else:
+        # OpenCV < 4.5.2 has no timeout properties; fall back to the backend defaults
+        cap = cv2.VideoCapture(url)
+    if not cap.isOpened():
+        cap.release()
+        raise ConnectionError(f"Cannot open stream: {url}")
+    return cap
+
+def probe_fps(cap, sample_frames=30):
+    # FPS reported by the stream, or measured over a few frames when the reported value is implausible
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if 0 < fps <= 120:
+        return fps
+    frame_count = 0
+    start = time.monotonic()
+    while frame_count < sample_frames:
+        if not cap.grab():
+            break
+        frame_count += 1
+    elapsed = time.monotonic() - start
+    return frame_count / elapsed if elapsed > 0 and frame_count else 1
+
+class FramePacer:
+    # Wall-clock pacing for an exact output frame rate: output frame k belongs to
+    # time start + k / fps. slots(timestamp) says how many output frames a captured
+    # frame fills: 0 when the input runs faster than fps (drop it), more than 1 when
+    # frames arrived late (repeat it so the file keeps real time). Gaps longer than
+    # max_gap seconds (e.g. a reconnect) resynchronise instead of repeating.
+    def __init__(self, fps, max_gap=2.0):
+        self.fps = fps
+        self.max_gap = max_gap
+        self.start = None
+        self.written = 0
+
+    def slots(self, timestamp):
+        if self.start is None:
+            self.start = timestamp
+        due = int((timestamp - self.start) * self.fps) + 1
+        count = due - self.written
+        if count > self.max_gap * self.fps:
+            # Resynchronise: continue from this frame as if no time was lost
+            self.start = timestamp - self.written / self.fps
+            count = 1
+        count = max(count, 0)
+        self.written += count
+        return count
+
+class FrameRingBuffer:
+    # Fixed-size buffer between a capture thread and a writer thread. put() never
+    # blocks: when the buffer is full the oldest frame is dropped (and counted), so a
+    # slow consumer can never stall the network side.
+    def __init__(self, capacity=64):
+        self.items = collections.deque(maxlen=capacity)
+        self.condition = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def __len__(self):
+        with self.condition:
+            return len(self.items)
+
+    def put(self, item):
+        with self.condition:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        # Oldest item, or None once the buffer is closed and drained (or on timeout)
+        with self.condition:
+            if not self.items and not self.closed:
+                self.condition.wait(timeout)
+            if self.items:
+                return self.items.popleft()
+            return None
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+class CaptureThread(threading.Thread):
+    # Drains a cv2.VideoCapture as fast as the stream delivers and pushes
+    # (timestamp, repeat, frame) into a ring buffer. Only every frame_interval-th
+    # frame is buffered, or with a pacer only the frames that fill an output slot
+    # (repeat is the number of slots); the others are grab()bed so the socket keeps
+    # being read without paying for colour conversion.
+    # With reopen (a callable returning a new capture, e.g. lambda: open_stream(url))
+    # a failed read triggers reconnects with exponential backoff instead of ending.
+    def __init__(self, cap, buffer, frame_interval=1, reopen=None, max_backoff=MAX_BACKOFF, pacer=None):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.buffer = buffer
+        self.frame_interval = max(1, frame_interval)
+        self.pacer = pacer
+        self.reopen = reopen
+        self.max_backoff = max_backoff
+        self.stop_event = threading.Event()
+        self.frames_read = 0
+        self.reconnects = 0
+
+    def stop(self):
+        self.stop_event.set()
+
+    def reconnect(self):
+        # Returns True once a new capture is open, False if stopped while waiting
+        self.cap.release()
+        backoff = 1
+        while not self.stop_event.wait(backoff):
+            try:
+                self.cap = self.reopen()
+            except ConnectionError:
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            self.reconnects += 1
+            return True
+        return False
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                if not self.cap.grab():
+                    if self.reopen is not None and self.reconnect():
+                        continue
+                    break
+                timestamp = time.monotonic()
+                frame_index = self.frames_read
+                self.frames_read += 1
+                if self.pacer is not None:
+                    repeat = self.pacer.slots(timestamp)
+                    if not repeat:
+                        continue
+                elif frame_index % self.frame_interval:
+                    continue
+                else:
+                    repeat = 1
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    continue
+                self.buffer.put((timestamp, repeat, frame))
+        finally:
+            self.cap.release()
+            self.buffer.close()
+
+class FfmpegRemuxer:
+    # Records a stream without decoding it: an `ffmpeg -c copy` subprocess remuxes the
+    # incoming H.264/H.265 packets straight into an MP4 or MKV file. MP4 output is
+    # fragmented, so a file cut short by a crash or power loss is still playable.
+    # With segment_seconds, output_path is a strftime pattern (see segment_filename)
+    # and ffmpeg starts a new file at the first keyframe after every segment_seconds.
+    def __init__(self, url, output_path, ffmpeg=None, include_audio=False, extra_args=(), segment_seconds=None):
+        self.url = url
+        self.output_path = output_path
+        self.segment_seconds = segment_seconds
+        self.ffmpeg = ffmpeg or os.environ.get('FFMPEG_BINARY') or shutil.which('ffmpeg')
+        if not self.ffmpeg:
+            raise FileNotFoundError("ffmpeg not found; install it or set FFMPEG_BINARY for passthrough recording")
+        self.include_audio = include_audio
+        self.extra_args = list(extra_args)
+        self.process = None
+        self.log = None
+
+    def command(self):
+        command = [self.ffmpeg, '-hide_banner', '-loglevel', 'error']
+        if self.url.startswith('rtsp://'):
+            command += ['-rtsp_transport', 'tcp']
+        command += ['-i', self.url, '-map', '0:v']
+        if self.include_audio:
+            command += ['-map', '0:a?']
+        command += ['-c', 'copy']
+        fragmented = '+frag_keyframe+empty_moov+default_base_moof'
+        if self.segment_seconds:
+            command += ['-f', 'segment', '-segment_time', str(self.segment_seconds),
+                        '-reset_timestamps', '1', '-strftime', '1']
+            if self.output_path.lower().endswith('.mp4'):
+                command += ['-segment_format', 'mp4', '-segment_format_options', f'movflags={fragmented}']
+        elif self.output_path.lower().endswith('.mp4'):
+            command += ['-movflags', fragmented]
+        return command + self.extra_args + ['-y', self.output_path]
+
+    def start(self):
+        # stderr goes to a temporary file so a chatty ffmpeg can never fill a pipe and block
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(self.command(), stdin=subprocess.PIPE,
+                                        stdout=subprocess.DEVNULL, stderr=self.log)
+        return self
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def error_output(self):
+        if self.log is None or self.is_running():
+            return ''
+        self.log.seek(0)
+        return self.log.read().decode(errors='replace').strip()
+
+    def stop(self, timeout=10):
+        # 'q' on stdin makes ffmpeg finish the file cleanly on every platform;
+        # kill only if it does not exit in time
+        if not self.is_running():
+            return
+        try:
+            self.process.stdin.write(b'q')
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+def segment_filename(stream_name, when=None):
+    # Timestamp first so segments of a stream sort chronologically by name
+    when = when or datetime.datetime.now()
+    return f"{when.strftime('%Y%m%d_%H%M%S')}_{stream_name}.mp4"
+
+def segment_pattern(stream_name):
+    # Matches the segments of exactly this stream: <YYYYmmdd_HHMMSS>_<stream_name>.mp4,
+    # or -<n>.mp4 for a second segment within the same second. Stream names never
+    # contain '-' (see safe_stream_name), so 'cam' never matches the files of 'cam_1'.
+    return re.compile(r"\d{8}_\d{6}_" + re.escape(stream_name) + r"(-\d+)?\.mp4")
+
+def enforce_retention(output_dir, stream_name, max_segments=None, max_bytes=None, keep=1):
+    # Delete the oldest segments of a stream until at most max_segments remain and
+    # they take at most max_bytes. The newest `keep` segments (the one being written)
+    # are never deleted. Returns the deleted paths.
+    pattern = segment_pattern(stream_name)
+    with os.scandir(output_dir) as entries:
+        segments = sorted((entry.name, entry.path, entry.stat().st_size) for entry in entries
+                          if entry.is_file() and pattern.fullmatch(entry.name))
+    deleted = []
+    total = sum(size for _, _, size in segments)
+    while len(segments) > keep and ((max_segments and len(segments) > max_segments)
+                                    or (max_bytes and total > max_bytes)):
+        _, path, size = segments.pop(0)
+        try:
+            os.remove(path)
+        except OSError:
+            break
+        total -= size
+        deleted.append(path)
+    return deleted
+
+class SegmentedVideoWriter:
+    # cv2.VideoWriter that rolls over to a new file every segment_seconds of output
+    # (counted in written frames, so every segment has exactly that length) and applies
+    # the retention policy after each finished segment. Each finished segment is
+    # released (finalized) immediately, so a crash loses at most the current one.
+    def __init__(self, output_dir, stream_name, fps, frame_size, segment_seconds=300,
+                 max_segments=None, max_bytes=None, fourcc='mp4v'):
+        self.output_dir = output_dir
+        self.stream_name = stream_name
+        self.fps = fps
+        self.frame_size = frame_size
+        self.segment_frames = int(round(segment_seconds * fps)) if segment_seconds else 0
+        self.max_segments = max_segments
+        self.max_bytes = max_bytes
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.writer = None
+        self.frames_in_segment = 0
+        self.current_path = None
+        self.segments = []
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+    def _open(self):
+        path = os.path.join(self.output_dir, segment_filename(self.stream_name))
+        if self.current_path == path or os.path.exists(path):
+            # Two segments within the same second: keep them apart
+            base, extension = os.path.splitext(path)
+            path = f"{base}-{len(self.segments)}{extension}"
+        self.writer = cv2.VideoWriter(path, self.fourcc, self.fps, self.frame_size)
+        self.current_path = path
+        self.frames_in_segment = 0
+
+    def _finish(self):
+        if self.writer is None:
+            return
+        self.writer.release()
+        self.writer = None
+        self.segments.append(self.current_path)
+        if self.max_segments or self.max_bytes:
+            enforce_retention(self.output_dir, self.stream_name, self.max_segments, self.max_bytes, keep=0)
+
+    def write(self, frame, repeat=1):
+        if frame.shape[1] != self.frame_size[0] or frame.shape[0] != self.frame_size[1]:
+            frame = cv2.resize(frame, self.frame_size, interpolation=cv2.INTER_AREA)
+        for _ in range(repeat):
+            if self.writer is None:
+                self._open()
+            self.writer.write(frame)
+            self.frames_in_segment += 1
+            if self.segment_frames and self.frames_in_segment >= self.segment_frames:
+                self._finish()
+
+    def close(self):
+        self._finish()
+
+class FrameSampler:
+    # Saves training images straight from a live capture instead of recording a video
+    # and extracting from it afterwards: every frame_interval-th frame, or one frame
+    # every every_seconds (by capture timestamp), resized to target_width x
+    # target_height and encoded by an EncoderPool so encoding never stalls the stream.
+    def __init__(self, output_dir, stream_name, frame_interval=30, every_seconds=None,
+                 target_width=640, target_height=640, image_format='png', quality=None,
+                 workers=2, max_queue=None):
+        if not every_seconds and frame_interval <= 0:
+            raise ValueError("frame_interval must be a positive integer")
+        self.output_dir = output_dir
+        self.stream_name = stream_name
+        self.frame_interval = frame_interval
+        self.every_seconds = every_seconds
+        self.target_size = (target_width, target_height)
+        self.extension = image_extension(image_format)
+        self.params = encode_params(self.extension, quality)
+        self.encoder = EncoderPool(workers, max_queue)
+        self.position = 0
+        self.next_index = frame_interval
+        self.next_time = None
+        self.saved = 0
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+    def capture_interval(self):
+        # Frames a capture thread may skip without retrieving them; only counting
+        # by frames allows that, timestamps need every frame
+        return 1 if self.every_seconds else self.frame_interval
+
+    def offer(self, frame, timestamp, frames=1):
+        # frames: how many captured (or paced output) frames this one stands for.
+        # Returns True when the frame was saved.
+        if self.every_seconds:
+            if self.next_time is not None and timestamp < self.next_time:
+                return False
+            self.next_time = timestamp + self.every_seconds
+        else:
+            self.position += frames
+            if self.position < self.next_index:
+                return False
+            while self.next_index <= self.position:
+                self.next_index += self.frame_interval
+        width, height = self.target_size
+        if width > 0 and height > 0 and (frame.shape[1] != width or frame.shape[0] != height):
+            frame = cv2.resize(frame, self.target_size, interpolation=cv2.INTER_AREA)
+        when = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.output_dir, f"{self.stream_name}_{when}_{self.saved:06d}{self.extension}")
+        self.encoder.submit(path, frame, self.params)
+        self.saved += 1
+        return True
+
+    def close(self):
+        # Wait for the queued images to be written
+        self.encoder.close()
+
+def safe_stream_name(name):
+    # Letters, digits, '.' and '_' only: usable in file names, and free of the '-'
+    # that segment_pattern reserves
+    return re.sub(r"[^A-Za-z0-9._]+", "_", name).strip("_") or "stream"
+
+def stream_name_from_url(url):
+    # Host, port and path, without credentials or query: cameras that share a path
+    # (e.g. every camera's /Streaming/Channels/101) still get distinct names.
+    # rtsp://user:pw@10.0.0.1:554/Streaming/Channels/101 -> 10.0.0.1_554_Streaming_Channels_101
+    parsed = urllib.parse.urlsplit(url)
+    if not parsed.netloc:
+        return safe_stream_name(url)
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    return safe_stream_name("_".join(str(part) for part in (parsed.hostname, port, parsed.path.strip("/")) if part))
+
+def record(url, fps, stop_event, output_dir=".", segment_seconds=None, max_bytes=None,
+           buffer_size=64, on_frame=None, on_stats=None, stats_interval=1.0, sampler=None, write_video=True,
+           stream_name=None):
+    # Headless decode-and-encode recording of one stream until stop_event is set.
+    # A capture thread drains the socket into a ring buffer (a slow disk only makes it
+    # drop its oldest frames); this thread writes paced frames into rolling segments.
+    # With a FrameSampler, training images are saved from the same decoded frames;
+    # write_video=False then only samples (no pacing, skipped frames are never retrieved).
+    # on_frame(frame) is called for every buffered frame (e.g. preview), on_stats(dict)
+    # about every stats_interval seconds and once at the end. Segments are named after
+    # stream_name (default: stream_name_from_url), which must be unique per output_dir.
+    if not write_video and sampler is None:
+        raise ValueError("Nothing to record: enable the video or give a FrameSampler")
+    cap = open_stream(url)
+    out = None
+    if write_video:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        name = safe_stream_name(stream_name or stream_name_from_url(url))
+        out = SegmentedVideoWriter(output_dir, name, fps, (width, height), segment_seconds=segment_seconds,
+                                   max_bytes=max_bytes)
+        capture_args = {'pacer': FramePacer(fps)}
+    else:
+        capture_args = {'frame_interval': sampler.capture_interval()}
+    buffer = FrameRingBuffer(buffer_size)
+    # A failed read mid-recording reconnects with backoff and keeps writing
+    capture = CaptureThread(cap, buffer, reopen=lambda: open_stream(url), **capture_args)
+    capture.start()
+
+    started = time.monotonic()
+    last_stats = started
+    frames_written = 0
+
+    def stats():
+        elapsed = time.monotonic() - started
+        result = {'frames_written': frames_written, 'fps': frames_written / elapsed if elapsed > 0 else 0.0,
+                  'dropped': buffer.dropped, 'reconnects': capture.reconnects,
+                  'segments': len(out.segments) if out else 0, 'file': out.current_path if out else None}
+        if sampler is not None:
+            result['samples'] = sampler.saved
+        return result
+
+    try:
+        while True:
+            if stop_event.is_set():
+                capture.stop()
+            item = buffer.get(timeout=0.5)
+            if item is not None:
+                timestamp, repeat, frame = item
+                if out is not None:
+                    out.write(frame, repeat)
+                    frames_written += repeat
+                    if sampler is not None:
+                        sampler.offer(frame, timestamp, repeat)
+                else:
+                    frames_written += 1
+                    # Each buffered frame stands for capture_interval() captured frames
+                    sampler.offer(frame, timestamp, capture.frame_interval)
+                if on_frame is not None:
+                    on_frame(frame)
+            elif buffer.closed:
+                break
+            if on_stats is not None and time.monotonic() - last_stats >= stats_interval:
+                last_stats = time.monotonic()
+                on_stats(stats())
+    finally:
+        capture.stop()
+        capture.join()
+        if out is not None:
+            out.close()
+        if sampler is not None:
+            sampler.close()
+    if on_stats is not None:
+        on_stats(stats())
+    return out.segments if out else []
+
+def record_passthrough(url, stop_event, output_dir=".", segment_seconds=None, max_bytes=None,
+                       on_frame=None, on_stats=None, stats_interval=1.0, ffmpeg=None, sampler=None,
+                       stream_name=None):
+    # Headless stream-copy recording: packets are remuxed by ffmpeg without decoding.
+    # Frames are only decoded when on_frame or a FrameSampler is given (preview or
+    # sampling). If ffmpeg exits because the stream dropped, a new file is started
+    # after an exponential backoff.
+    stream_name = safe_stream_name(stream_name or stream_name_from_url(url))
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    capture = None
+    capture_interval = sampler.capture_interval() if sampler is not None else 1
+    if on_frame is not None or sampler is not None:
+        try:
+            capture = CaptureThread(open_stream(url), FrameRingBuffer(2), frame_interval=capture_interval,
+                                    reopen=lambda: open_stream(url))
+            capture.start()
+        except ConnectionError:
+            capture = None
+
+    filenames = []
+    restarts = 0
+    backoff = 1
+    last_stats = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            # With segments ffmpeg names each file itself from the same timestamp pattern
+            if segment_seconds:
+                filename = "%Y%m%d_%H%M%S_" + stream_name + ".mp4"
+            else:
+                filename = segment_filename(stream_name)
+            remuxer = FfmpegRemuxer(url, os.path.join(output_dir, filename), ffmpeg=ffmpeg,
+                                    segment_seconds=segment_seconds).start()
+            filenames.append(filename)
+            started = time.monotonic()
+            last_retention = started
+            while not stop_event.is_set() and remuxer.is_running():
+                if max_bytes and time.monotonic() - last_retention > 10:
+                    enforce_retention(output_dir, stream_name, max_bytes=max_bytes)
+                    last_retention = time.monotonic()
+                if capture is None:
+                    stop_event.wait(0.5)
+                else:
+                    item = capture.buffer.get(timeout=0.5)
+                    if item is not None:
+                        if sampler is not None:
+                            sampler.offer(item[2], item[0], capture_interval)
+                        if on_frame is not None:
+                            on_frame(item[2])
+                if on_stats is not None and time.monotonic() - last_stats >= stats_interval:
+                    last_stats = time.monotonic()
+                    stats = {'file': filename, 'ffmpeg_restarts': restarts,
+                             'reconnects': capture.reconnects if capture else 0}
+                    if sampler is not None:
+                        stats['samples'] = sampler.saved
+                    on_stats(stats)
+            remuxer.stop()
+            if not stop_event.is_set():
+                print(f"ffmpeg stopped for {url}: {remuxer.error_output()}")
+                restarts += 1
+                # Reset the backoff after a file that ran for a while
+                backoff = 1 if time.monotonic() - started > MAX_BACKOFF else min(backoff * 2, MAX_BACKOFF)
+                stop_event.wait(backoff)
+    finally:
+        if capture is not None:
+            capture.stop()
+            capture.join()
+        if sampler is not None:
+            sampler.close()
+    return filenames
@@ -0,0 +1,254 @@
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from .metrics import metrics
+from .streaming import MAX_BACKOFF, FrameSampler, record, record_passthrough, safe_stream_name, stream_name_from_url
+
+# Size of each stream's tile in the preview mosaic, and how often workers publish one
+PREVIEW_SIZE = (320, 180)
+PREVIEW_FPS = 5
+
+class PreviewSlot:
+    # One downscaled BGR frame in shared memory plus a sequence number, written by a
+    # stream's worker process and read by the main process without pickling frames
+    def __init__(self, size=PREVIEW_SIZE, name=None, sequence=None, context=None):
+        width, height = size
+        self.size = size
+        self.shape = (height, width, 3)
+        nbytes = width * height * 3
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.owner = True
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            # Spawned workers share the supervisor's resource tracker, so attaching
+            # does not hand ownership over; only the creating process unlinks
+            self.owner = False
+        self.sequence = sequence if sequence is not None else (context or multiprocessing).Value('Q', 0)
+        self.frame = np.ndarray(self.shape, dtype=np.uint8, buffer=self.memory.buf)
+
+    def handle(self):
+        # Picklable description for attaching from a worker process
+        return self.memory.name, self.size, self.sequence
+
+    def write(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        with self.sequence.get_lock():
+            self.frame[:] = small
+            self.sequence.value += 1
+
+    def read(self):
+        # (sequence, copy of the frame); sequence 0 means nothing was published yet
+        with self.sequence.get_lock():
+            return self.sequence.value, self.frame.copy()
+
+    def close(self):
+        del self.frame
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+def _worker_main(stream_id, config, stop_event, status_queue, preview_handle):
+    # Entry point of a stream's worker process: records until stop_event is set and
+    # reports its statistics to the supervisor through status_queue
+    cv2.setNumThreads(1)
+    # Ctrl-C in a terminal reaches the whole process group; the supervisor decides
+    # when to stop, so the worker can finalize its file instead of dying mid-write
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    slot = None
+    on_frame = None
+    if preview_handle is not None:
+        name, size, sequence = preview_handle
+        slot = PreviewSlot(size, name=name, sequence=sequence)
+        interval = 1.0 / config.get('preview_fps', PREVIEW_FPS)
+        last_preview = [0.0]
+
+        def publish(frame):
+            # Publish at a capped rate; resizing every frame would waste the worker's time
+            now = time.monotonic()
+            if now - last_preview[0] >= interval:
+                last_preview[0] = now
+                slot.write(frame)
+        on_frame = publish
+
+    def on_stats(stats):
+        try:
+            status_queue.put_nowait((stream_id, 'running', stats))
+        except queue.Full:
+            pass
+
+    record_video = config.get('record_video', True)
+    try:
+        # Names the segments and the sample folder; unique per output_dir
+        stream_name = safe_stream_name(config.get('name') or stream_name_from_url(config['url']))
+        sampler = None
+        if config.get('sample'):
+            # FrameSampler settings; images go to <output_dir>/<stream>_frames unless set
+            sample = dict(config['sample'])
+            sample_dir = sample.pop('output_dir', None) or os.path.join(config.get('output_dir', '.'),
+                                                                         f"{stream_name}_frames")
+            sampler = FrameSampler(sample_dir, stream_name, **sample)
+        if config.get('passthrough') and record_video:
+            record_passthrough(config['url'], stop_event, output_dir=config.get('output_dir', '.'),
+                               segment_seconds=config.get('segment_seconds'), max_bytes=config.get('max_bytes'),
+                               on_frame=on_frame, on_stats=on_stats, sampler=sampler, stream_name=stream_name)
+        else:
+            record(config['url'], config['fps'], stop_event, output_dir=config.get('output_dir', '.'),
+                   segment_seconds=config.get('segment_seconds'), max_bytes=config.get('max_bytes'),
+                   buffer_size=config.get('buffer_size', 64), on_frame=on_frame, on_stats=on_stats,
+                   sampler=sampler, write_video=record_video, stream_name=stream_name)
+        status_queue.put((stream_id, 'stopped', {}))
+    except Exception as error:
+        # Temporary: the supervisor restarts the worker ('failed' is its call alone)
+        status_queue.put((stream_id, 'error', {'error': str(error)}))
+        raise SystemExit(1)
+    finally:
+        if slot is not None:
+            slot.close()
+
+class StreamSupervisor:
+    # Runs every stream in its own worker process (decoding never contends for one
+    # GIL), restarts workers that crash with an exponential backoff, collects per-stream
+    # health and assembles the shared-memory previews into one mosaic. All methods are
+    # meant to be called from the main (GUI) thread; poll() must be called regularly.
+    def __init__(self, preview_size=PREVIEW_SIZE, max_restarts=None):
+        self.context = multiprocessing.get_context('spawn')
+        self.status_queue = self.context.Queue(maxsize=1000)
+        self.preview_size = preview_size
+        self.max_restarts = max_restarts
+        self.streams = {}
+
+    def start(self, stream_id, config, preview=False):
+        # config: url, fps, and optionally name (of the segment files and sample folder,
+        # default: host and path of the url), passthrough, output_dir, segment_seconds,
+        # max_bytes, buffer_size, preview_fps, record_video (default True) and sample
+        # (FrameSampler keyword arguments such as every_seconds, target_width, image_format)
+        self.stop(stream_id)
+        slot = PreviewSlot(self.preview_size, context=self.context) if preview else None
+        self.streams[stream_id] = {
+            'config': config, 'slot': slot, 'process': None, 'stop_event': None,
+            'health': {'state': 'starting', 'restarts': 0}, 'next_start': 0.0, 'backoff': 1,
+        }
+        self._spawn(stream_id)
+
+    def _spawn(self, stream_id):
+        stream = self.streams[stream_id]
+        stream['stop_event'] = self.context.Event()
+        preview_handle = stream['slot'].handle() if stream['slot'] is not None else None
+        process = self.context.Process(target=_worker_main, daemon=True,
+                                       args=(stream_id, stream['config'], stream['stop_event'],
+                                             self.status_queue, preview_handle))
+        process.start()
+        stream['process'] = process
+        stream['started'] = time.monotonic()
+        stream['health']['state'] = 'running'
+
+    def stop(self, stream_id, timeout=10, wait=True):
+        # With wait=False only the stop is requested (so a GUI never blocks); poll()
+        # removes the stream once its worker has finalized its file and exited
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            return
+        if not wait:
+            if stream['stop_event'] is not None:
+                stream['stop_event'].set()
+            stream['health']['state'] = 'stopping'
+            return
+        del self.streams[stream_id]
+        if stream['process'] is not None and stream['process'].is_alive():
+            stream['stop_event'].set()
+            stream['process'].join(timeout)
+            if stream['process'].is_alive():
+                stream['process'].terminate()
+                stream['process'].join()
+        if stream['slot'] is not None:
+            stream['slot'].close()
+
+    def shutdown(self):
+        for stream_id in list(self.streams):
+            self.stop(stream_id)
+
+    def poll(self):
+        # Drain worker reports and restart workers that died without being stopped
+        while True:
+            try:
+                stream_id, state, stats = self.status_queue.get_nowait()
+            except queue.Empty:
+                break
+            stream = self.streams.get(stream_id)
+            if stream is not None:
+                stream['health'].update(stats)
+                if state == 'running':
+                    # Recovered: the error of an earlier attempt no longer applies
+                    stream['health'].pop('error', None)
+                if stream['health']['state'] != 'stopping':
+                    stream['health']['state'] = state
+
+        now = time.monotonic()
+        for stream_id, stream in list(self.streams.items()):
+            process = stream['process']
+            health = stream['health']
+            if health['state'] == 'stopping':
+                if process is None or not process.is_alive():
+                    self.stop(stream_id)
+                    health['state'] = 'stopped'
+                continue
+            if process is not None and not process.is_alive() and health['state'] != 'stopped':
+                # Crashed (or failed to connect): schedule a restart with backoff
+                stream['process'] = None
+                if self.max_restarts is not None and health['restarts'] >= self.max_restarts:
+                    health['state'] = 'failed'
+                    continue
+                ran_for = now - stream['started']
+                stream['backoff'] = 1 if ran_for > MAX_BACKOFF else min(stream['backoff'] * 2, MAX_BACKOFF)
+                stream['next_start'] = now + stream['backoff']
+                health['state'] = 'restarting'
+            if stream['process'] is None and health['state'] == 'restarting' and now >= stream['next_start']:
+                health['restarts'] += 1
+                self._spawn(stream_id)
+
+        for stream_id, health in self.health().items():
+            metrics.gauge('record.up', int(health['state'] == 'running'), stream=stream_id)
+            metrics.gauge('record.restarts', health['restarts'], stream=stream_id)
+            for key in ('fps', 'dropped', 'reconnects', 'frames_written', 'samples'):
+                if key in health:
+                    metrics.gauge(f'record.{key}', health[key], stream=stream_id)
+        return self.health()
+
+    def health(self):
+        # {stream_id: {'state', 'restarts', 'fps', 'dropped', 'reconnects', ...}}. States:
+        # starting, running, error (the worker failed to connect or crashed, a restart
+        # follows), restarting, stopping, stopped, and failed, which is final: only
+        # reached once max_restarts restarts are used up.
+        return {stream_id: dict(stream['health']) for stream_id, stream in self.streams.items()}
+
+    def mosaic(self, columns=None):
+        # All previews tiled into one image (None when no stream has a preview)
+        tiles = []
+        for stream_id, stream in self.streams.items():
+            if stream['slot'] is None:
+                continue
+            sequence, frame = stream['slot'].read()
+            label = f"{stream_id} {stream['health'].get('state', '')}"
+            if sequence == 0:
+                frame[:] = 0
+            cv2.putText(frame, label, (5, 15), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 0), 1)
+            tiles.append(frame)
+        if not tiles:
+            return None
+        columns = columns or math.ceil(math.sqrt(len(tiles)))
+        rows = math.ceil(len(tiles) / columns)
+        height, width = tiles[0].shape[:2]
+        mosaic = np.zeros((rows * height, columns * width, 3), dtype=np.uint8)
+        for i, tile in enumerate(tiles):
+            row, column = divmod(i, columns)
+            mosaic[row * height:(row + 1) * height, column * width:(column + 1) * width] = tile
+        return mosaic
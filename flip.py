@@ -1,57 +1,9 @@
 import os
-import cv2
 import tkinter as tk
-from tkinter import filedialog, messagebox
-
-def flip_image(image):
-    # Flip image horizontally
-    return cv2.flip(image, 1)
-
-def flip_annotation(annotation_path, image_width):
-    flipped_annotations = []
-    with open(annotation_path, 'r') as file:
-        for line in file:
-            # Each line is expected to be: class_id center_x center_y box_width box_height
-            class_id, center_x, center_y, box_width, box_height = map(float, line.split())
-            # Flip the x-coordinate (assuming normalized coordinates)
-            flipped_center_x = 1 - center_x
-            flipped_annotations.append(f"{int(class_id)} {flipped_center_x:.6f} {center_y:.6f} {box_width:.6f} {box_height:.6f}\n")
-    return flipped_annotations
-
-def process_images_with_flip(image_folder, label_folder, output_folder, prefix='fl_'):
-    # Create the output folder if it doesn't exist
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-
-    for filename in os.listdir(image_folder):
-        if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-            image_path = os.path.join(image_folder, filename)
-            # Annotation file is expected to have the same basename with .txt extension
-            annotation_filename = os.path.splitext(filename)[0] + '.txt'
-            annotation_path = os.path.join(label_folder, annotation_filename)
-
-            # Read the image
-            image = cv2.imread(image_path)
-            if image is None:
-                print(f"Could not read image: {image_path}")
-                continue
-            height, width, _ = image.shape
-
-            # Flip the image
-            flipped_image = flip_image(image)
-            output_image_filename = prefix + filename
-            output_image_path = os.path.join(output_folder, output_image_filename)
-            cv2.imwrite(output_image_path, flipped_image)
-            print(f"Flipped image saved: {output_image_path}")
-
-            # Process and save flipped annotation file if it exists
-            if os.path.exists(annotation_path):
-                flipped_annotations = flip_annotation(annotation_path, width)
-                output_annotation_filename = prefix + os.path.basename(annotation_path)
-                output_annotation_path = os.path.join(output_folder, output_annotation_filename)
-                with open(output_annotation_path, 'w') as output_file:
-                    output_file.writelines(flipped_annotations)
-                print(f"Flipped annotation saved: {output_annotation_path}")
+from tkinter import filedialog, messagebox, ttk
+
+from dataset_tools.augment import MANIFEST_FILENAME, PRIMITIVES, write_virtual_manifest
+from dataset_tools.flip import process_images_with_flip
 
 def select_image_folder():
     folder = filedialog.askdirectory(title="Select Image Directory")
@@ -77,32 +29,86 @@ def start_process():
         messagebox.showerror("Error", "Please select all directories: image, label, and output.")
         return
 
-    process_images_with_flip(image_folder, label_folder, output_folder)
-    messagebox.showinfo("Process Completed", "All flipped images and labels have been saved.")
-
-# Create main Tkinter window
-root = tk.Tk()
-root.title("Flip Images & Annotations")
-root.geometry("600x200")
-
-# Variables to store directory paths
-image_folder_var = tk.StringVar()
-label_folder_var = tk.StringVar()
-output_folder_var = tk.StringVar()
-
-# Create UI components
-tk.Label(root, text="Image Directory:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
-tk.Entry(root, textvariable=image_folder_var, width=50).grid(row=0, column=1, padx=5, pady=5)
-tk.Button(root, text="Browse", command=select_image_folder).grid(row=0, column=2, padx=5, pady=5)
-
-tk.Label(root, text="Label Directory:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
-tk.Entry(root, textvariable=label_folder_var, width=50).grid(row=1, column=1, padx=5, pady=5)
-tk.Button(root, text="Browse", command=select_label_folder).grid(row=1, column=2, padx=5, pady=5)
+    transforms = [name for name, var in transform_vars.items() if var.get()]
+    if not transforms:
+        messagebox.showerror("Error", "Please select at least one transform.")
+        return
 
-tk.Label(root, text="Output Folder:").grid(row=2, column=0, padx=5, pady=5, sticky="e")
-tk.Entry(root, textvariable=output_folder_var, width=50).grid(row=2, column=1, padx=5, pady=5)
-tk.Button(root, text="Browse", command=select_output_folder).grid(row=2, column=2, padx=5, pady=5)
+    try:
+        workers = int(workers_var.get())
+        quality = int(quality_var.get()) if quality_var.get().strip() else None
+        if workers <= 0:
+            raise ValueError
+    except ValueError:
+        messagebox.showerror("Error", "Please enter a positive worker count and an integer quality.")
+        return
+    image_format = None if format_var.get() == SAME_FORMAT else format_var.get()
 
-tk.Button(root, text="Process", command=start_process, width=20).grid(row=3, column=1, padx=5, pady=20)
+    if virtual_var.get():
+        # Only the manifest is written; images are transformed when they are loaded
+        manifest_path = os.path.join(output_folder, MANIFEST_FILENAME)
+        count = write_virtual_manifest(image_folder, label_folder, manifest_path, transforms=transforms)
+        messagebox.showinfo("Process Completed", f"Virtual augmentation manifest with {count} samples saved to: {manifest_path}")
+        return
 
-root.mainloop()
+    process_images_with_flip(image_folder, label_folder, output_folder, transforms=transforms,
+                             workers=workers, image_format=image_format, quality=quality,
+                             incremental=incremental_var.get())
+    messagebox.showinfo("Process Completed", "All transformed images and labels have been saved.")
+
+SAME_FORMAT = "Same as input"
+
+if __name__ == "__main__":
+    # Create main Tkinter window
+    root = tk.Tk()
+    root.title("Flip Images & Annotations")
+    root.geometry("700x310")
+
+    # Variables to store directory paths
+    image_folder_var = tk.StringVar()
+    label_folder_var = tk.StringVar()
+    output_folder_var = tk.StringVar()
+    virtual_var = tk.BooleanVar(value=False)
+    incremental_var = tk.BooleanVar(value=False)
+    workers_var = tk.StringVar(value=str(os.cpu_count() or 1))
+    format_var = tk.StringVar(value=SAME_FORMAT)
+    quality_var = tk.StringVar()
+    transform_vars = {name: tk.BooleanVar(value=(name == 'hflip')) for name in PRIMITIVES}
+
+    # Create UI components
+    tk.Label(root, text="Image Directory:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(root, textvariable=image_folder_var, width=50).grid(row=0, column=1, padx=5, pady=5)
+    tk.Button(root, text="Browse", command=select_image_folder).grid(row=0, column=2, padx=5, pady=5)
+
+    tk.Label(root, text="Label Directory:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(root, textvariable=label_folder_var, width=50).grid(row=1, column=1, padx=5, pady=5)
+    tk.Button(root, text="Browse", command=select_label_folder).grid(row=1, column=2, padx=5, pady=5)
+
+    tk.Label(root, text="Output Folder:").grid(row=2, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(root, textvariable=output_folder_var, width=50).grid(row=2, column=1, padx=5, pady=5)
+    tk.Button(root, text="Browse", command=select_output_folder).grid(row=2, column=2, padx=5, pady=5)
+
+    tk.Label(root, text="Transforms:").grid(row=3, column=0, padx=5, pady=5, sticky="e")
+    transform_frame = tk.Frame(root)
+    transform_frame.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+    for name, var in transform_vars.items():
+        tk.Checkbutton(transform_frame, text=name, variable=var).pack(side="left", padx=2)
+
+    options_frame = tk.Frame(root)
+    options_frame.grid(row=4, column=1, padx=5, pady=5, sticky="w")
+    tk.Checkbutton(options_frame, text="Virtual (write manifest only, no image copies)", variable=virtual_var).pack(side="left", padx=2)
+    tk.Checkbutton(options_frame, text="Skip unchanged images", variable=incremental_var).pack(side="left", padx=2)
+
+    tk.Label(root, text="Output:").grid(row=5, column=0, padx=5, pady=5, sticky="e")
+    output_frame = tk.Frame(root)
+    output_frame.grid(row=5, column=1, padx=5, pady=5, sticky="w")
+    ttk.Combobox(output_frame, textvariable=format_var, values=[SAME_FORMAT, "png", "jpg", "webp"],
+                 state="readonly", width=14).pack(side="left", padx=2)
+    tk.Label(output_frame, text="Quality (JPEG/WebP 0-100, PNG 0-9):").pack(side="left", padx=2)
+    tk.Entry(output_frame, textvariable=quality_var, width=5).pack(side="left", padx=2)
+    tk.Label(output_frame, text="Workers:").pack(side="left", padx=2)
+    tk.Spinbox(output_frame, from_=1, to=64, textvariable=workers_var, width=4).pack(side="left", padx=2)
+
+    tk.Button(root, text="Process", command=start_process, width=20).grid(row=6, column=1, padx=5, pady=20)
+
+    root.mainloop()
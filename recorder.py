@@ -2,18 +2,29 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import cv2
 import threading
-import datetime
-import os
+import queue
+
+from dataset_tools.streaming import open_stream, probe_fps
+from dataset_tools.supervisor import PREVIEW_FPS, StreamSupervisor
+
+PREVIEW_WINDOW = "Preview"
+PREVIEW_INTERVAL_MS = int(1000 / PREVIEW_FPS)
 
 class StreamEntry:
-    def __init__(self, parent, row):
+    def __init__(self, parent, row, settings=None):
+        self.settings = settings  # RecorderApp with the shared segment/retention settings
         self.rtsp_var = tk.StringVar()
         self.fps_var = tk.StringVar(value="Check")
         self.max_fps = 1
         self.selected_fps = tk.IntVar(value=1)
         self.recording = False
-        self.thread = None
+        self.stream_id = f"stream {row + 1}"
+        self.status_var = tk.StringVar(value="")
         self.display_var = tk.BooleanVar(value=False)  # New: for display checkbox
+        self.buffer_size = 64  # Frames held between capture and writer threads
+        self.passthrough_var = tk.BooleanVar(value=False)  # Remux with ffmpeg instead of re-encoding
+        self.video_var = tk.BooleanVar(value=True)  # Record video
+        self.sample_var = tk.BooleanVar(value=False)  # Save training images from the live frames
 
         self.rtsp_entry = tk.Entry(parent, textvariable=self.rtsp_var, width=50)
         self.rtsp_entry.grid(row=row, column=0, padx=5, pady=5)
@@ -31,32 +42,51 @@ class StreamEntry:
         self.display_cb = tk.Checkbutton(parent, text="Display", variable=self.display_var)
         self.display_cb.grid(row=row, column=4, padx=5)  # New: Display checkbox
 
+        self.passthrough_cb = tk.Checkbutton(parent, text="Passthrough", variable=self.passthrough_var)
+        self.passthrough_cb.grid(row=row, column=5, padx=5)
+
+        self.video_cb = tk.Checkbutton(parent, text="Video", variable=self.video_var)
+        self.video_cb.grid(row=row, column=6, padx=5)
+
+        self.sample_cb = tk.Checkbutton(parent, text="Sample", variable=self.sample_var)
+        self.sample_cb.grid(row=row, column=7, padx=5)
+
+        self.status_label = tk.Label(parent, textvariable=self.status_var, width=40, anchor="w")
+        self.status_label.grid(row=row, column=8, padx=5)
+
     def check_fps(self):
         rtsp_url = self.rtsp_var.get()
         if not rtsp_url:
             messagebox.showerror("Error", "Please enter RTSP link.")
             return
-        cap = cv2.VideoCapture(rtsp_url)
-        # Timeout logic
-        start_time = datetime.datetime.now()
-        while not cap.isOpened():
-            if (datetime.datetime.now() - start_time).total_seconds() > 30:
-                messagebox.showerror("Error", "Cannot open stream (timeout after 30 seconds).")
-                return
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        if fps <= 0 or fps > 120:
-            # fallback: estimate fps
-            frame_count = 0
-            start = cv2.getTickCount()
-            while frame_count < 30:
-                ret, _ = cap.read()
-                if not ret:
-                    break
-                frame_count += 1
-            end = cv2.getTickCount()
-            time = (end - start) / cv2.getTickFrequency()
-            fps = frame_count / time if time > 0 else 1
-        cap.release()
+        # Opening and probing can take seconds; do it on a worker thread and let the
+        # Tk main loop pick up the result so the window stays responsive
+        self.check_btn.config(state="disabled", text="Checking...")
+        results = queue.Queue()
+        threading.Thread(target=self._probe_fps, args=(rtsp_url, results), daemon=True).start()
+        self.check_btn.after(100, self._poll_fps, results)
+
+    def _probe_fps(self, rtsp_url, results):
+        try:
+            cap = open_stream(rtsp_url)
+        except ConnectionError as error:
+            results.put(error)
+            return
+        try:
+            results.put(probe_fps(cap))
+        finally:
+            cap.release()
+
+    def _poll_fps(self, results):
+        try:
+            fps = results.get_nowait()
+        except queue.Empty:
+            self.check_btn.after(100, self._poll_fps, results)
+            return
+        self.check_btn.config(state="normal", text="Check")
+        if isinstance(fps, Exception):
+            messagebox.showerror("Error", f"Cannot open stream: {fps}")
+            return
         self.max_fps = int(fps) if fps > 0 else 1
         self.fps_dropdown['values'] = list(range(1, self.max_fps + 1))
         self.selected_fps.set(self.max_fps)
@@ -64,72 +94,159 @@ class StreamEntry:
         messagebox.showinfo("FPS Checked", f"Max FPS: {self.max_fps}")
 
     def toggle_recording(self):
+        # Recording runs in a worker process owned by the app's StreamSupervisor
+        supervisor = self.settings.supervisor
         if not self.recording:
+            if not self.video_var.get() and not self.sample_var.get():
+                messagebox.showerror("Error", "Select Video, Sample or both.")
+                return
+            segment_seconds, max_bytes = self.segment_settings()
+            config = {
+                'url': self.rtsp_var.get(),
+                'fps': self.selected_fps.get(),
+                'passthrough': self.passthrough_var.get(),
+                'segment_seconds': segment_seconds,
+                'max_bytes': max_bytes,
+                'buffer_size': self.buffer_size,
+                'record_video': self.video_var.get(),
+            }
+            if self.sample_var.get():
+                try:
+                    config['sample'] = self.settings.sample_settings()
+                except ValueError as error:
+                    messagebox.showerror("Error", f"Invalid sampling settings: {error}")
+                    return
+            supervisor.start(self.stream_id, config, preview=self.display_var.get())
             self.recording = True
             self.start_btn.config(text="Stop")
-            self.thread = threading.Thread(target=self.record_stream)
-            self.thread.start()
         else:
+            supervisor.stop(self.stream_id, wait=False)
             self.recording = False
             self.start_btn.config(text="Start")
 
-    def record_stream(self):
-        rtsp_url = self.rtsp_var.get()
-        fps = self.selected_fps.get()
-        cap = cv2.VideoCapture(rtsp_url)
-        # Timeout logic
-        start_time = datetime.datetime.now()
-        while not cap.isOpened():
-            if (datetime.datetime.now() - start_time).total_seconds() > 30:
-                messagebox.showerror("Error", "Cannot open stream for recording (timeout after 30 seconds).")
+    def segment_settings(self):
+        # (segment length in seconds or None, disk quota in bytes or None) from the app settings
+        if self.settings is None:
+            return None, None
+        try:
+            minutes = float(self.settings.segment_minutes_var.get() or 0)
+            quota_gb = float(self.settings.quota_gb_var.get() or 0)
+        except ValueError:
+            return None, None
+        return (minutes * 60 or None), (int(quota_gb * 1024 ** 3) or None)
+
+    def update_health(self, health):
+        # Called by RecorderApp on the main thread with this stream's supervisor health
+        if health is None or health.get('state') in ('stopped', 'failed'):
+            if self.recording:
                 self.recording = False
                 self.start_btn.config(text="Start")
+                if health is not None and health.get('state') == 'failed':
+                    messagebox.showerror("Error", f"Recording failed: {health.get('error', 'unknown error')}")
+            if health is None:
                 return
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        stream_name = rtsp_url.split('/')[-1].split('?')[0] or "stream"
-        dt_str = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{dt_str}_{stream_name}.mp4"
-        out = cv2.VideoWriter(filename, fourcc, fps, (width, height))
-        frame_interval = int(round(self.max_fps / fps)) if self.max_fps > fps else 1
-        frame_count = 0
-        display = self.display_var.get()
-        window_name = f"Stream: {stream_name}"
-        while self.recording:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if frame_count % frame_interval == 0:
-                out.write(frame)
-                if display:
-                    cv2.imshow(window_name, frame)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        self.recording = False
-                        break
-            frame_count += 1
-        cap.release()
-        out.release()
-        if display:
-            cv2.destroyWindow(window_name)
-        self.start_btn.config(text="Start")
-        self.recording = False
-        messagebox.showinfo("Recording stopped", f"Saved to {filename}")
+        parts = [health.get('state', '')]
+        if health.get('state') in ('error', 'restarting') and health.get('error'):
+            # Temporary: the supervisor keeps restarting the stream
+            parts.append(health['error'][:60])
+        if 'fps' in health and self.video_var.get():
+            parts.append(f"{health['fps']:.1f} fps")
+        if health.get('samples'):
+            parts.append(f"{health['samples']} images")
+        if health.get('dropped'):
+            parts.append(f"dropped {health['dropped']}")
+        if health.get('reconnects'):
+            parts.append(f"reconnects {health['reconnects']}")
+        if health.get('restarts'):
+            parts.append(f"restarts {health['restarts']}")
+        self.status_var.set(", ".join(parts))
 
 class RecorderApp:
     def __init__(self, root):
         self.root = root
         self.root.title("RTSP Recorder")
         self.entries = []
+        # Shared output settings: segment length (0 = one file) and disk quota per stream (0 = unlimited)
+        self.segment_minutes_var = tk.StringVar(value="5")
+        self.quota_gb_var = tk.StringVar(value="0")
+        settings_frame = tk.Frame(root)
+        settings_frame.pack(padx=10, pady=(10, 0), anchor="w")
+        tk.Label(settings_frame, text="Segment (min):").pack(side="left")
+        tk.Entry(settings_frame, textvariable=self.segment_minutes_var, width=5).pack(side="left", padx=5)
+        tk.Label(settings_frame, text="Keep per stream (GB):").pack(side="left")
+        tk.Entry(settings_frame, textvariable=self.quota_gb_var, width=5).pack(side="left", padx=5)
+        # Sampling settings for streams with "Sample" checked: interval (frames or seconds),
+        # training image size (640x640 as in vid2images) and image format
+        self.sample_interval_var = tk.StringVar(value="30")
+        self.sample_unit_var = tk.StringVar(value="frames")
+        self.sample_width_var = tk.StringVar(value="640")
+        self.sample_height_var = tk.StringVar(value="640")
+        self.sample_format_var = tk.StringVar(value="jpg")
+        sample_frame = tk.Frame(root)
+        sample_frame.pack(padx=10, pady=(5, 0), anchor="w")
+        tk.Label(sample_frame, text="Sample every:").pack(side="left")
+        tk.Entry(sample_frame, textvariable=self.sample_interval_var, width=5).pack(side="left", padx=5)
+        ttk.Combobox(sample_frame, textvariable=self.sample_unit_var, values=["frames", "seconds"],
+                     state="readonly", width=8).pack(side="left")
+        tk.Label(sample_frame, text="Size:").pack(side="left", padx=(10, 0))
+        tk.Entry(sample_frame, textvariable=self.sample_width_var, width=5).pack(side="left", padx=5)
+        tk.Label(sample_frame, text="x").pack(side="left")
+        tk.Entry(sample_frame, textvariable=self.sample_height_var, width=5).pack(side="left", padx=5)
+        tk.Label(sample_frame, text="Format:").pack(side="left", padx=(10, 0))
+        ttk.Combobox(sample_frame, textvariable=self.sample_format_var, values=["png", "jpg", "webp"],
+                     state="readonly", width=6).pack(side="left", padx=5)
         self.frame = tk.Frame(root)
         self.frame.pack(padx=10, pady=10)
         self.add_entry_btn = tk.Button(root, text="Add RTSP Link", command=self.add_entry)
         self.add_entry_btn.pack(pady=5)
         self.add_entry()  # Add first entry
 
+        # Worker processes record the streams; this (main) thread polls their health
+        # and shows all previews in one mosaic window at a capped rate
+        self.supervisor = StreamSupervisor()
+        self.preview_shown = False
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.root.after(PREVIEW_INTERVAL_MS, self.tick)
+
+    def tick(self):
+        health = self.supervisor.poll()
+        for entry in self.entries:
+            entry.update_health(health.get(entry.stream_id))
+        mosaic = self.supervisor.mosaic()
+        if mosaic is not None:
+            cv2.imshow(PREVIEW_WINDOW, mosaic)
+            cv2.waitKey(1)
+            self.preview_shown = True
+        elif self.preview_shown:
+            cv2.destroyWindow(PREVIEW_WINDOW)
+            self.preview_shown = False
+        self.root.after(PREVIEW_INTERVAL_MS, self.tick)
+
+    def close(self):
+        # Let every worker finalize its current file before the window goes away
+        self.supervisor.shutdown()
+        cv2.destroyAllWindows()
+        self.root.destroy()
+
+    def sample_settings(self):
+        # FrameSampler keyword arguments from the sampling settings; raises ValueError
+        interval = float(self.sample_interval_var.get())
+        if interval <= 0:
+            raise ValueError("the interval must be positive")
+        settings = {
+            'target_width': int(self.sample_width_var.get()),
+            'target_height': int(self.sample_height_var.get()),
+            'image_format': self.sample_format_var.get(),
+        }
+        if self.sample_unit_var.get() == "seconds":
+            settings['every_seconds'] = interval
+        else:
+            settings['frame_interval'] = int(interval)
+        return settings
+
     def add_entry(self):
         row = len(self.entries)
-        entry = StreamEntry(self.frame, row)
+        entry = StreamEntry(self.frame, row, settings=self)
         self.entries.append(entry)
 
 if __name__ == "__main__":
@@ -1,104 +1,7 @@
-import os
-import shutil
-import random
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 
-def split_dataset(images_folder, labels_folder, output_folder, train_ratio):
-    # Create the output structure:
-    # output_folder/
-    #    images/
-    #         train/
-    #         val/
-    #    labels/
-    #         train/
-    #         val/
-    output_images_folder = os.path.join(output_folder, "images")
-    output_labels_folder = os.path.join(output_folder, "labels")
-    
-    os.makedirs(os.path.join(output_images_folder, "train"), exist_ok=True)
-    os.makedirs(os.path.join(output_images_folder, "val"), exist_ok=True)
-    os.makedirs(os.path.join(output_labels_folder, "train"), exist_ok=True)
-    os.makedirs(os.path.join(output_labels_folder, "val"), exist_ok=True)
-
-
-
-    # Get all image files (supporting multiple formats)
-    image_extensions = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tiff")
-    image_files = [f for f in os.listdir(images_folder) if f.lower().endswith(image_extensions)]
-    if not image_files:
-        messagebox.showerror("Error", "No image files found in the images folder!")
-        return
-    random.shuffle(image_files)
-
-    # Calculate the number of training images
-    train_size = int(len(image_files) * train_ratio)
-    train_images = image_files[:train_size]
-    val_images = image_files[train_size:]
-
-    # Move training images and corresponding labels
-    for img in train_images:
-        src_img = os.path.join(images_folder, img)
-        dest_img = os.path.join(output_images_folder, "train", img)
-        shutil.move(src_img, dest_img)
-
-        # Replace image extension with .txt for label filename
-        label_filename = os.path.splitext(img)[0] + ".txt"
-        src_label = os.path.join(labels_folder, label_filename)
-        if os.path.exists(src_label):
-            dest_label = os.path.join(output_labels_folder, "train", label_filename)
-            shutil.move(src_label, dest_label)
-
-    # Move validation images and corresponding labels
-    for img in val_images:
-        src_img = os.path.join(images_folder, img)
-        dest_img = os.path.join(output_images_folder, "val", img)
-        shutil.move(src_img, dest_img)
-
-        label_filename = os.path.splitext(img)[0] + ".txt"
-        src_label = os.path.join(labels_folder, label_filename)
-        if os.path.exists(src_label):
-            dest_label = os.path.join(output_labels_folder, "val", label_filename)
-            shutil.move(src_label, dest_label)
-
-
-    # # Get all image files (assuming .png files; update extension if needed)
-    # image_files = [f for f in os.listdir(images_folder) if f.lower().endswith(".png")]
-    # if not image_files:
-    #     messagebox.showerror("Error", "No image files found in the images folder!")
-    #     return
-    # random.shuffle(image_files)
-    
-    # # Calculate the number of training images
-    # train_size = int(len(image_files) * train_ratio)
-    # train_images = image_files[:train_size]
-    # val_images = image_files[train_size:]
-    
-    # # Move training images and corresponding labels
-    # for img in train_images:
-    #     src_img = os.path.join(images_folder, img)
-    #     dest_img = os.path.join(output_images_folder, "train", img)
-    #     shutil.move(src_img, dest_img)
-        
-    #     label_filename = img.replace(".png", ".txt")
-    #     src_label = os.path.join(labels_folder, label_filename)
-    #     if os.path.exists(src_label):
-    #         dest_label = os.path.join(output_labels_folder, "train", label_filename)
-    #         shutil.move(src_label, dest_label)
-    
-    # # Move validation images and corresponding labels
-    # for img in val_images:
-    #     src_img = os.path.join(images_folder, img)
-    #     dest_img = os.path.join(output_images_folder, "val", img)
-    #     shutil.move(src_img, dest_img)
-        
-    #     label_filename = img.replace(".png", ".txt")
-    #     src_label = os.path.join(labels_folder, label_filename)
-    #     if os.path.exists(src_label):
-    #         dest_label = os.path.join(output_labels_folder, "val", label_filename)
-    #         shutil.move(src_label, dest_label)
-    
-    messagebox.showinfo("Success", "Dataset split completed!")
+from dataset_tools.split import SPLIT_MODES, split_dataset
 
 def select_images_folder():
     folder = filedialog.askdirectory(title="Select Images Folder")
@@ -132,38 +35,80 @@ def start_split():
         messagebox.showerror("Error", "Invalid training ratio selected.")
         return
     
-    split_dataset(images_folder, labels_folder, output_folder, train_ratio_decimal)
-
-# Create main Tkinter window
-root = tk.Tk()
-root.title("Dataset Splitter")
-root.geometry("600x250")
-
-# Tkinter StringVars to hold folder paths and training ratio
-images_folder_var = tk.StringVar()
-labels_folder_var = tk.StringVar()
-output_folder_var = tk.StringVar()
-train_ratio_var = tk.StringVar(value="80%")  # Default to 80%
-
-# Layout UI components
-tk.Label(root, text="Images Folder:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
-tk.Entry(root, textvariable=images_folder_var, width=50).grid(row=0, column=1, padx=5, pady=5)
-tk.Button(root, text="Browse", command=select_images_folder).grid(row=0, column=2, padx=5, pady=5)
-
-tk.Label(root, text="Labels Folder:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
-tk.Entry(root, textvariable=labels_folder_var, width=50).grid(row=1, column=1, padx=5, pady=5)
-tk.Button(root, text="Browse", command=select_labels_folder).grid(row=1, column=2, padx=5, pady=5)
-
-tk.Label(root, text="Output Folder:").grid(row=2, column=0, padx=5, pady=5, sticky="e")
-tk.Entry(root, textvariable=output_folder_var, width=50).grid(row=2, column=1, padx=5, pady=5)
-tk.Button(root, text="Browse", command=select_output_folder).grid(row=2, column=2, padx=5, pady=5)
+    try:
+        test_ratio_decimal = int(test_ratio_var.get().replace("%", "")) / 100.0
+    except ValueError:
+        messagebox.showerror("Error", "Invalid test ratio selected.")
+        return
+    if train_ratio_decimal + test_ratio_decimal >= 1:
+        messagebox.showerror("Error", "Training and test ratios leave nothing for validation.")
+        return
 
-tk.Label(root, text="Training Ratio:").grid(row=3, column=0, padx=5, pady=5, sticky="e")
-# Options for training ratio as percentage from 10% to 90%
-train_ratio_options = [f"{i}%" for i in range(10, 100, 10)]
-train_ratio_combo = ttk.Combobox(root, textvariable=train_ratio_var, values=train_ratio_options, state="readonly", width=10)
-train_ratio_combo.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+    # Empty seed means a different random split every run
+    seed_str = seed_var.get().strip()
+    try:
+        seed = int(seed_str) if seed_str else None
+    except ValueError:
+        messagebox.showerror("Error", "Seed must be an integer.")
+        return
 
-tk.Button(root, text="Split Dataset", command=start_split, width=20).grid(row=4, column=1, pady=20)
+    try:
+        split_dataset(images_folder, labels_folder, output_folder, train_ratio_decimal, mode=mode_var.get(), seed=seed,
+                      test_ratio=test_ratio_decimal, stratify=stratify_var.get())
+    except ValueError as error:
+        messagebox.showerror("Error", str(error))
+        return
+    messagebox.showinfo("Success", "Dataset split completed!")
 
-root.mainloop()
+if __name__ == "__main__":
+    # Create main Tkinter window
+    root = tk.Tk()
+    root.title("Dataset Splitter")
+    root.geometry("600x400")
+
+    # Tkinter StringVars to hold folder paths and training ratio
+    images_folder_var = tk.StringVar()
+    labels_folder_var = tk.StringVar()
+    output_folder_var = tk.StringVar()
+    train_ratio_var = tk.StringVar(value="80%")  # Default to 80%
+    mode_var = tk.StringVar(value="move")
+    seed_var = tk.StringVar(value="0")
+    test_ratio_var = tk.StringVar(value="0%")  # Test split is optional
+    stratify_var = tk.BooleanVar(value=False)
+
+    # Layout UI components
+    tk.Label(root, text="Images Folder:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(root, textvariable=images_folder_var, width=50).grid(row=0, column=1, padx=5, pady=5)
+    tk.Button(root, text="Browse", command=select_images_folder).grid(row=0, column=2, padx=5, pady=5)
+
+    tk.Label(root, text="Labels Folder:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(root, textvariable=labels_folder_var, width=50).grid(row=1, column=1, padx=5, pady=5)
+    tk.Button(root, text="Browse", command=select_labels_folder).grid(row=1, column=2, padx=5, pady=5)
+
+    tk.Label(root, text="Output Folder:").grid(row=2, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(root, textvariable=output_folder_var, width=50).grid(row=2, column=1, padx=5, pady=5)
+    tk.Button(root, text="Browse", command=select_output_folder).grid(row=2, column=2, padx=5, pady=5)
+
+    tk.Label(root, text="Training Ratio:").grid(row=3, column=0, padx=5, pady=5, sticky="e")
+    # Options for training ratio as percentage from 10% to 90%
+    train_ratio_options = [f"{i}%" for i in range(10, 100, 10)]
+    train_ratio_combo = ttk.Combobox(root, textvariable=train_ratio_var, values=train_ratio_options, state="readonly", width=10)
+    train_ratio_combo.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+
+    tk.Label(root, text="Test Ratio:").grid(row=4, column=0, padx=5, pady=5, sticky="e")
+    test_ratio_options = [f"{i}%" for i in range(0, 60, 10)]
+    test_ratio_combo = ttk.Combobox(root, textvariable=test_ratio_var, values=test_ratio_options, state="readonly", width=10)
+    test_ratio_combo.grid(row=4, column=1, padx=5, pady=5, sticky="w")
+
+    tk.Label(root, text="Split Mode:").grid(row=5, column=0, padx=5, pady=5, sticky="e")
+    mode_combo = ttk.Combobox(root, textvariable=mode_var, values=SPLIT_MODES, state="readonly", width=10)
+    mode_combo.grid(row=5, column=1, padx=5, pady=5, sticky="w")
+
+    tk.Label(root, text="Seed:").grid(row=6, column=0, padx=5, pady=5, sticky="e")
+    tk.Entry(root, textvariable=seed_var, width=10).grid(row=6, column=1, padx=5, pady=5, sticky="w")
+
+    tk.Checkbutton(root, text="Stratify by class", variable=stratify_var).grid(row=7, column=1, padx=5, pady=5, sticky="w")
+
+    tk.Button(root, text="Split Dataset", command=start_split, width=20).grid(row=8, column=1, pady=20)
+
+    root.mainloop()
@@ -3,50 +3,24 @@ import os
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 
-def process_video(video_path, save_frame, target_width, target_height):
-    # Open video stream
-    cap = cv2.VideoCapture(video_path)
-
-    # Get frames per second (FPS)
-    fps = int(cap.get(cv2.CAP_PROP_FPS))
-    print(f'Frames per second (FPS): {fps}')
+from dataset_tools.extraction import extract_frames
 
+def process_video(video_path, save_frame, target_width, target_height, every_seconds=None,
+                  image_format='png', quality=None, workers=1, dedup_method=None):
     # Extract video name for output directory
     video_name = os.path.splitext(os.path.basename(video_path))[0]
     output_dir = f'{video_name}_frames'
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    frame_count = 0
-    image_count = 0
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    
-    progress_bar['maximum'] = total_frames
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        frame_count += 1
+    def update_progress(frame_count, total_frames):
+        progress_bar['maximum'] = total_frames
         progress_bar['value'] = frame_count
         root.update_idletasks()
 
-        # Resize the frame if its size doesn't match the selected dimensions
-        if target_width > 0 and target_height > 0:
-            if frame.shape[1] != target_width or frame.shape[0] != target_height:
-                frame = cv2.resize(frame, (target_width, target_height), interpolation=cv2.INTER_AREA)
-
-        # Save the frame every 'save_frame' frames
-        if frame_count % save_frame == 0:
-            image_filename = os.path.join(output_dir, f'{video_name}_frame_{image_count:04d}.png')
-            cv2.imwrite(image_filename, frame)
-            print(f'Stored {image_filename}')
-            image_count += 1
-
-    cap.release()
-    cv2.destroyAllWindows()
+    extract_frames(video_path, output_dir, save_frame, target_width, target_height,
+                   every_seconds=every_seconds, progress=update_progress,
+                   image_format=image_format, quality=quality, workers=workers,
+                   dedup_method=dedup_method)
+    progress_bar['value'] = progress_bar['maximum']
 
     messagebox.showinfo("Process Completed", f"Frames saved to: {os.path.abspath(output_dir)}")
 
@@ -65,7 +39,22 @@ def select_video():
 
 def start_process():
     video_path = video_path_var.get()
-    save_frame = int(frame_interval_var.get())
+
+    # The interval is a frame count or, with the "seconds" unit, a time step
+    try:
+        if interval_unit_var.get() == "seconds":
+            every_seconds = float(frame_interval_var.get())
+            save_frame = 1
+            if every_seconds <= 0:
+                raise ValueError
+        else:
+            every_seconds = None
+            save_frame = int(frame_interval_var.get())
+            if save_frame <= 0:
+                raise ValueError
+    except ValueError:
+        messagebox.showerror("Error", "Please enter a valid positive interval.")
+        return
 
     # Validate width and height inputs
     try:
@@ -81,54 +70,91 @@ def start_process():
         messagebox.showerror("Error", "Please select a video file.")
         return
 
-    process_video(video_path, save_frame, target_width, target_height)
-
-# Create main window
-root = tk.Tk()
-root.title("Video Frame Extractor")
-root.geometry("400x400")
-
-video_path_var = tk.StringVar()
-frame_interval_var = tk.StringVar(value="30")
-# Set default image size to 640x640 for YOLOv8
-width_var = tk.StringVar(value="640")
-height_var = tk.StringVar(value="640")
-
-# Video Selection
-video_label = tk.Label(root, text="Select Video File:")
-video_label.pack(pady=5)
-video_button = tk.Button(root, text="Browse", command=select_video)
-video_button.pack()
-
-video_entry = tk.Entry(root, textvariable=video_path_var, width=50)
-video_entry.pack()
-
-# FPS Display Label
-fps_label = tk.Label(root, text="Frames per second (FPS): -", font=("Arial", 10, "bold"))
-fps_label.pack(pady=5)
-
-# Frame Interval Dropdown
-frame_label = tk.Label(root, text="Select Frame Interval (1-50):")
-frame_label.pack(pady=5)
-frame_dropdown = ttk.Combobox(root, textvariable=frame_interval_var, values=[str(i) for i in range(1, 51)])
-frame_dropdown.pack()
-
-# Image Size Entry
-size_label = tk.Label(root, text="Enter Image Size (Width x Height):")
-size_label.pack(pady=5)
-size_frame = tk.Frame(root)
-size_frame.pack()
-width_entry = tk.Entry(size_frame, textvariable=width_var, width=10)
-width_entry.pack(side=tk.LEFT, padx=5)
-height_entry = tk.Entry(size_frame, textvariable=height_var, width=10)
-height_entry.pack(side=tk.LEFT, padx=5)
-
-# Progress Bar
-progress_bar = ttk.Progressbar(root, orient="horizontal", length=300, mode="determinate")
-progress_bar.pack(pady=20)
-
-# Start Button
-start_button = tk.Button(root, text="Start", command=start_process)
-start_button.pack(pady=10)
-
-root.mainloop()
+    try:
+        quality = int(quality_var.get()) if quality_var.get().strip() else None
+        workers = int(workers_var.get())
+        if workers <= 0:
+            raise ValueError
+    except ValueError:
+        messagebox.showerror("Error", "Please enter an integer quality and a positive worker count.")
+        return
+
+    process_video(video_path, save_frame, target_width, target_height, every_seconds=every_seconds,
+                  image_format=format_var.get(), quality=quality, workers=workers,
+                  dedup_method='dhash' if dedup_var.get() else None)
+
+if __name__ == "__main__":
+    # Create main window
+    root = tk.Tk()
+    root.title("Video Frame Extractor")
+    root.geometry("440x510")
+
+    video_path_var = tk.StringVar()
+    frame_interval_var = tk.StringVar(value="30")
+    interval_unit_var = tk.StringVar(value="frames")
+    # Set default image size to 640x640 for YOLOv8
+    width_var = tk.StringVar(value="640")
+    height_var = tk.StringVar(value="640")
+    format_var = tk.StringVar(value="png")
+    quality_var = tk.StringVar()
+    workers_var = tk.StringVar(value=str(os.cpu_count() or 1))
+    dedup_var = tk.BooleanVar(value=False)
+
+    # Video Selection
+    video_label = tk.Label(root, text="Select Video File:")
+    video_label.pack(pady=5)
+    video_button = tk.Button(root, text="Browse", command=select_video)
+    video_button.pack()
+
+    video_entry = tk.Entry(root, textvariable=video_path_var, width=50)
+    video_entry.pack()
+
+    # FPS Display Label
+    fps_label = tk.Label(root, text="Frames per second (FPS): -", font=("Arial", 10, "bold"))
+    fps_label.pack(pady=5)
+
+    # Frame Interval Dropdown
+    frame_label = tk.Label(root, text="Select Interval (1-50 frames, or seconds):")
+    frame_label.pack(pady=5)
+    interval_frame = tk.Frame(root)
+    interval_frame.pack()
+    frame_dropdown = ttk.Combobox(interval_frame, textvariable=frame_interval_var, values=[str(i) for i in range(1, 51)], width=10)
+    frame_dropdown.pack(side=tk.LEFT, padx=5)
+    unit_dropdown = ttk.Combobox(interval_frame, textvariable=interval_unit_var, values=["frames", "seconds"], state="readonly", width=8)
+    unit_dropdown.pack(side=tk.LEFT, padx=5)
+
+    # Image Size Entry
+    size_label = tk.Label(root, text="Enter Image Size (Width x Height):")
+    size_label.pack(pady=5)
+    size_frame = tk.Frame(root)
+    size_frame.pack()
+    width_entry = tk.Entry(size_frame, textvariable=width_var, width=10)
+    width_entry.pack(side=tk.LEFT, padx=5)
+    height_entry = tk.Entry(size_frame, textvariable=height_var, width=10)
+    height_entry.pack(side=tk.LEFT, padx=5)
+
+    # Output Format, Quality and Encoder Workers
+    format_label = tk.Label(root, text="Image Format / Quality (JPEG/WebP 0-100, PNG 0-9) / Workers:")
+    format_label.pack(pady=5)
+    format_frame = tk.Frame(root)
+    format_frame.pack()
+    format_dropdown = ttk.Combobox(format_frame, textvariable=format_var, values=["png", "jpg", "webp"], state="readonly", width=6)
+    format_dropdown.pack(side=tk.LEFT, padx=5)
+    quality_entry = tk.Entry(format_frame, textvariable=quality_var, width=5)
+    quality_entry.pack(side=tk.LEFT, padx=5)
+    workers_spinbox = tk.Spinbox(format_frame, from_=1, to=64, textvariable=workers_var, width=4)
+    workers_spinbox.pack(side=tk.LEFT, padx=5)
+
+    # Near-duplicate suppression
+    dedup_checkbox = tk.Checkbutton(root, text="Skip near-duplicate frames", variable=dedup_var)
+    dedup_checkbox.pack(pady=5)
+
+    # Progress Bar
+    progress_bar = ttk.Progressbar(root, orient="horizontal", length=300, mode="determinate")
+    progress_bar.pack(pady=20)
+
+    # Start Button
+    start_button = tk.Button(root, text="Start", command=start_process)
+    start_button.pack(pady=10)
+
+    root.mainloop()